@@ -0,0 +1,86 @@
+"""
+Accuracy-parity and throughput check for the sentiment backends.
+
+Runs a fixed review corpus through the reference fp32 pipeline and each
+alternative backend, then reports label agreement, score drift and reviews/sec.
+
+    python TestAPI/check_sentiment_parity.py                 # quantized + onnx
+    python TestAPI/check_sentiment_parity.py quantized       # one backend
+"""
+import os, sys, time, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.sentiment_backends import build_pipeline, run_pipeline, BACKENDS
+
+CORPUS = [
+    "Absolutely stunning views from the top, worth every penny.",
+    "The staff were rude and the line took over two hours. Never again.",
+    "Great museum for kids, lots of hands-on exhibits and clean washrooms.",
+    "Overpriced food and the place was filthy.",
+    "A hidden gem! The pasta was incredible and the service was warm.",
+    "It was okay. Nothing special but not bad either.",
+    "We waited forever for our table and the steak arrived cold.",
+    "Beautiful trails, well maintained, perfect for a morning hike.",
+    "The exhibits felt dated and half the galleries were closed.",
+    "Friendly guides, fascinating history, would definitely come back.",
+    "Parking was a nightmare and the tickets were way too expensive.",
+    "Loved the atmosphere, the cocktails and the live music.",
+    "Dirty rooms, broken elevator, and nobody at the front desk cared.",
+    "The kids had a blast at the aquarium, especially the shark tunnel.",
+    "Bland food, tiny portions, and we felt rushed out the door.",
+    "One of the best meals of my life, the tasting menu was flawless.",
+    "Crowded and noisy, hard to enjoy anything.",
+    "Clean, safe and easy to get around. Great for a first visit.",
+    "The tour was cancelled last minute without a refund.",
+    "Gorgeous gardens and a lovely little cafe by the entrance.",
+    "Not worth the hype. Long lines for a five minute ride.",
+    "Impeccable service and a wine list that impressed everyone.",
+    "The audio guide kept breaking and the staff couldn't help.",
+    "Peaceful spot by the water, we stayed until sunset.",
+    # Long review (exceeds 512 tokens once repeated) to exercise truncation
+    ("I arrived early and the museum was already busy, but the entry process was quick. " * 60).strip(),
+]
+
+
+def score(backend, batch_size):
+    pipe = build_pipeline(backend)
+    run_pipeline(pipe, CORPUS[:2], batch_size)  # warm up
+    start = time.perf_counter()
+    outs = run_pipeline(pipe, CORPUS, batch_size)
+    return outs, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("backends", nargs="*", default=["quantized", "onnx"], choices=BACKENDS)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--min-agreement", type=float, default=0.95)
+    args = parser.parse_args()
+
+    ref, ref_secs = score("pipeline", args.batch_size)
+    print(f"pipeline   {len(CORPUS) / ref_secs:8.1f} reviews/s (reference)")
+
+    failed = False
+    for backend in args.backends:
+        try:
+            outs, secs = score(backend, args.batch_size)
+        except ImportError as e:
+            print(f"{backend:<10} skipped: {e}")
+            continue
+        pairs = [(r, o) for r, o in zip(ref, outs) if r is not None and o is not None]
+        agree = sum(r["label"] == o["label"] for r, o in pairs) / len(pairs)
+        drift = max(abs(r["score"] - o["score"]) for r, o in pairs)
+        print(
+            f"{backend:<10} {len(CORPUS) / secs:8.1f} reviews/s "
+            f"x{ref_secs / secs:.2f}  label agreement {agree:.1%}  max score drift {drift:.3f}"
+        )
+        for i, (r, o) in enumerate(zip(ref, outs)):
+            if r and o and r["label"] != o["label"]:
+                print(f"    mismatch #{i}: {r['label']} -> {o['label']}  {CORPUS[i][:60]!r}")
+        failed |= agree < args.min_agreement
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,102 @@
+import time
 from fastapi import FastAPI
-from routers import itinerary, sentiment
+from fastapi.responses import JSONResponse, PlainTextResponse
+from routers import itinerary, sentiment, photos
+from services import http_client
+from services.cache import get_cache_stats
+from services.poi_refresher import start_background_refresh, stop_background_refresh
+from services.place_details import details_scope
+from services.photo_cache import get_photo_cache
+from services.metrics import (
+    timings_scope, observe, inc, route_label, server_timing_header, render_prometheus,
+    METRICS_SERVER_TIMING
+)
+from services.sentiment_service import start_warmup, model_state, SENTIMENT_WARMUP
+from services.resilience import deadline_scope, get_resilience_stats, REQUEST_DEADLINE
 
 app = FastAPI(title="SmartTravelSystem API", version="1.0.0")
 app.include_router(itinerary.router, prefix="/itinerary", tags=["Itinerary"])
 app.include_router(sentiment.router, prefix="/sentiment", tags=["Sentiment"])
+app.include_router(photos.router, prefix="/photos", tags=["Photos"])
+
+@app.middleware("http")
+async def place_details_memo(request, call_next):
+    # Each request shares one Place Details lookup per place_id
+    with details_scope():
+        return await call_next(request)
+
+
+@app.middleware("http")
+async def request_deadline(request, call_next):
+    # Upstream calls made for this request stop waiting after REQUEST_DEADLINE seconds
+    with deadline_scope(REQUEST_DEADLINE):
+        return await call_next(request)
+
+
+@app.middleware("http")
+async def request_metrics(request, call_next):
+    # Registered last, so it wraps the whole request (including the memo middleware).
+    # For streamed responses the time covers the work done before the first byte.
+    start = time.perf_counter()
+    with timings_scope() as timings:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - start
+
+    path = route_label(request.scope)
+    observe("http_request_duration_seconds", elapsed, route=path, method=request.method)
+    inc("http_requests_total", route=path, method=request.method, status=response.status_code)
+    if METRICS_SERVER_TIMING:
+        response.headers["Server-Timing"] = server_timing_header(timings, total=elapsed)
+    return response
+
+
+@app.on_event("startup")
+def warm_sentiment_model():
+    # Only loads the model when SENTIMENT_WARMUP=true; otherwise it loads on first use
+    start_warmup()
+
+
+@app.on_event("startup")
+def start_poi_refresher():
+    # Only runs when POI_STORE_ENABLED=true
+    start_background_refresh()
+
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    stop_background_refresh()
+    await itinerary.itinerary_jobs.stop()
+    await http_client.aclose()
+
 
 @app.get("/")
 def root():
     return {"message": "SmartTravelSystem API is running"}
+
+
+@app.get("/ready")
+def ready():
+    """Readiness probe; reports sentiment model state (503 while a requested warmup is pending)."""
+    state = model_state()
+    if SENTIMENT_WARMUP and state["status"] != "ready":
+        return JSONResponse(status_code=503, content={"ready": False, "sentiment_model": state})
+    return {"ready": True, "sentiment_model": state}
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Size and hit-rate counters for the Places and Gemini response caches and the photo cache."""
+    return {**get_cache_stats(), "photos": get_photo_cache().stats()}
+
+
+@app.get("/upstream/stats")
+def upstream_stats():
+    """Circuit breaker state per upstream, fallback / hedge counts and deadline hits."""
+    return {**get_resilience_stats(), "calls": http_client.get_stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics: stage and request latency histograms, upstream calls, caches, LLM tokens."""
+    photos = [("cache_entries", (("cache", "photos"),), get_photo_cache().stats()["size"])]
+    return PlainTextResponse(render_prometheus(photos), media_type="text/plain; version=0.0.4")
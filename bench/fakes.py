@@ -0,0 +1,228 @@
+# bench/fakes.py
+"""
+Local stand-ins for the external services, with injectable latency and errors.
+
+FakePlacesServer  HTTP server speaking the Places Text Search / Details / Photo API
+FakeGeminiModel   drop-in for google.generativeai.GenerativeModel
+FakeSentimentPipeline  cheap replacement for the transformers pipeline
+"""
+import json, time, random, asyncio, threading, base64
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Smallest valid JPEG is not needed here; clients only cache and forward the bytes
+FAKE_JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 4096 + b"\xff\xd9"
+
+
+class Latency:
+    """latency_ms +/- jitter_ms (uniform) and an error probability, seeded for repeatability."""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """(delay_seconds, fail)"""
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+            fail = self._rng.random() < self.error_rate
+        return max(0.0, self.latency_ms + jitter) / 1000, fail
+
+
+# ----------- Google Places -----------
+def _encode_token(query: str, page: int):
+    return base64.urlsafe_b64encode(json.dumps([query, page]).encode()).decode()
+
+
+def _decode_token(token: str):
+    query, page = json.loads(base64.urlsafe_b64decode(token.encode()))
+    return query, page
+
+
+class FakePlacesServer:
+    """Threaded HTTP server on 127.0.0.1 that answers like maps.googleapis.com."""
+
+    def __init__(self, fixtures, latency: Latency, port: int = 0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _count(self, endpoint: str, key: str):
+        with self._lock:
+            c = self.counts.setdefault(endpoint, {"calls": 0, "errors": 0})
+            c[key] += 1
+
+    def reset_counts(self):
+        with self._lock:
+            counts, self.counts = self.counts, {}
+        return counts
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-places", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, data: dict):
+                self._send(200, json.dumps(data).encode())
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                endpoint = url.path.rstrip("/").split("/")[-2 if url.path.endswith("json") else -1]
+                server._count(endpoint, "calls")
+
+                delay, fail = server.latency.draw()
+                time.sleep(delay)
+                if fail:
+                    server._count(endpoint, "errors")
+                    return self._send(503, b'{"status": "UNKNOWN_ERROR"}')
+
+                if endpoint == "textsearch":
+                    if "pagetoken" in params:
+                        query, page = _decode_token(params["pagetoken"])
+                    else:
+                        query, page = params.get("query", ""), 0
+                    results, more = server.fixtures.search_page(query, page)
+                    data = {"status": "OK" if results else "ZERO_RESULTS", "results": results}
+                    if more:
+                        data["next_page_token"] = _encode_token(query, page + 1)
+                    return self._json(data)
+                if endpoint == "details":
+                    fields = params.get("fields", "").split(",")
+                    return self._json({"status": "OK", "result": server.fixtures.details(params.get("place_id", ""), fields)})
+                if endpoint == "photo":
+                    return self._send(200, FAKE_JPEG, "image/jpeg")
+                return self._send(404, b'{"status": "NOT_FOUND"}')
+
+        return Handler
+
+
+# ----------- Gemini -----------
+class _Usage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+
+
+class _Response:
+    def __init__(self, text: str, prompt: str):
+        self.text = text
+        self.usage_metadata = _Usage(len(prompt) // 4, len(text) // 4)
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _StreamResponse:
+    """Iterable (sync or async) of text chunks; usage is known once iteration ends."""
+
+    def __init__(self, text: str, prompt: str, chunk_delay: float, chunk_chars: int = 200):
+        self._chunks = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+        self._delay = chunk_delay
+        self.usage_metadata = _Usage(len(prompt) // 4, len(text) // 4)
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            time.sleep(self._delay)
+            yield _Chunk(chunk)
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            await asyncio.sleep(self._delay)
+            yield _Chunk(chunk)
+
+
+class FakeGeminiModel:
+    """
+    Stands in for GenerativeModel: latency is paid up front (time to first token),
+    streamed responses are split into chunks paced over the same latency.
+    """
+
+    calls = 0
+    _lock = threading.Lock()
+
+    def __init__(self, fixtures, latency: Latency):
+        self.fixtures = fixtures
+        self.latency = latency
+
+    def _start(self, prompt: str):
+        with FakeGeminiModel._lock:
+            FakeGeminiModel.calls += 1
+        delay, fail = self.latency.draw()
+        return self.fixtures.llm_text(prompt), delay, fail
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        text, delay, fail = self._start(prompt)
+        if fail:
+            time.sleep(delay)
+            raise RuntimeError("fake gemini: injected error")
+        if stream:
+            return _StreamResponse(text, prompt, delay / max(1, len(text) // 200 + 1))
+        time.sleep(delay)
+        return _Response(text, prompt)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        text, delay, fail = self._start(prompt)
+        if fail:
+            await asyncio.sleep(delay)
+            raise RuntimeError("fake gemini: injected error")
+        if stream:
+            return _StreamResponse(text, prompt, delay / max(1, len(text) // 200 + 1))
+        await asyncio.sleep(delay)
+        return _Response(text, prompt)
+
+
+# ----------- Sentiment model -----------
+NEGATIVE_WORDS = {"rude", "dirty", "filthy", "cold", "bland", "overpriced", "crowded", "noisy", "broken",
+                  "never", "worst", "terrible", "bad", "slow", "expensive", "cancelled", "nightmare"}
+
+
+class FakeSentimentPipeline:
+    """Lexicon scorer with a fixed per-text cost, called like a transformers pipeline."""
+
+    def __init__(self, per_text_ms: float = 2.0):
+        self.per_text_ms = per_text_ms
+        self.tokenizer = None
+
+    def _score(self, text: str):
+        words = set(text.lower().split())
+        neg = len(words & NEGATIVE_WORDS)
+        return {"label": "NEGATIVE" if neg else "POSITIVE", "score": 0.9 if neg < 2 else 0.99}
+
+    def __call__(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        time.sleep(self.per_text_ms * len(texts) / 1000)
+        return [self._score(t) for t in texts]
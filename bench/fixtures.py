@@ -0,0 +1,112 @@
+# bench/fixtures.py
+"""Places / Gemini stand-in data built from the recorded responses in ResponseSamples/."""
+import os, json, hashlib
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ResponseSamples")
+
+ITINERARY_SAMPLE = "response_Waterloo_2Days_Luxury_NoKidsFriendly_Family_Adventure.json"
+SENTIMENT_SAMPLES = ("response_SentimentInsights_byPlaceId.json", "response_SentimentInsights_byPlaceName.json")
+
+DESTINATIONS = ["Waterloo", "Toronto", "Ottawa", "Montreal", "Vancouver", "Calgary", "Quebec City", "Halifax"]
+
+
+def _load(name: str):
+    with open(os.path.join(SAMPLES_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _stable_int(text: str):
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _photo_refs(place: dict):
+    refs = []
+    for url in place.get("photo_urls", []):
+        if "photo_reference=" in url:
+            refs.append(url.split("photo_reference=")[1].split("&")[0])
+    return refs
+
+
+def _to_raw(place: dict):
+    """A normalized plan_struct place turned back into a Text Search result."""
+    return {
+        "place_id": place["place_id"],
+        "name": place["name"],
+        "formatted_address": place.get("address"),
+        "geometry": {"location": {"lat": place["lat"], "lng": place["lon"]}},
+        "rating": place.get("rating"),
+        "user_ratings_total": place.get("user_ratings_total"),
+        "price_level": place.get("price_level"),
+        "types": place.get("types", []),
+        "photos": [{"photo_reference": ref} for ref in _photo_refs(place)[:1]],
+    }
+
+
+class Fixtures:
+    """Deterministic Text Search pages, Place Details and LLM text derived from the samples."""
+
+    def __init__(self, places_per_query: int = 20, page_size: int = 20):
+        itinerary = _load(ITINERARY_SAMPLE)
+        self.itinerary_text = itinerary["itinerary_text"]
+        self.attractions = [_to_raw(p) for day in itinerary["plan_struct"] for p in day["attractions"]]
+        self.restaurants = [_to_raw(p) for day in itinerary["plan_struct"] for p in day["restaurants"]]
+        self.photo_refs = {p["place_id"]: _photo_refs(p)
+                           for day in itinerary["plan_struct"] for p in day["attractions"] + day["restaurants"]}
+
+        self.reviews, self.summaries, self.sample_places = [], [], []
+        for name in SENTIMENT_SAMPLES:
+            data = _load(name)
+            sentiment = data.get("sentiment", data)
+            self.reviews.extend(s["text"] for s in sentiment["samples"])
+            self.summaries.append(sentiment["human_summary"])
+            place = data.get("place") or {"place_id": data["place_id"]}
+            self.sample_places.append(place)
+
+        self.places_per_query = places_per_query
+        self.page_size = page_size
+
+    # ----------- Text Search -----------
+    def search_results(self, query: str):
+        """All results for a query: fixture places, varied per query so destinations differ."""
+        base = self.restaurants if "restaurant" in query.lower() else self.attractions
+        salt = _stable_int(query.lower())
+        out = []
+        for i in range(self.places_per_query):
+            src = base[i % len(base)]
+            place = json.loads(json.dumps(src))
+            place["place_id"] = f"{src['place_id']}-{salt % 10000}-{i}"
+            loc = place["geometry"]["location"]
+            # Spread copies over a few km so the day planner has real work to do
+            loc["lat"] += ((salt >> (i % 16)) % 41 - 20) * 0.001 * (1 + i // len(base))
+            loc["lng"] += ((salt >> ((i + 5) % 16)) % 41 - 20) * 0.001 * (1 + i // len(base))
+            if i >= len(base):
+                place["name"] = f"{src['name']} #{i // len(base) + 1}"
+            out.append(place)
+        return out
+
+    def search_page(self, query: str, page: int):
+        """(results, has_next_page) for one page."""
+        results = self.search_results(query)
+        start = page * self.page_size
+        return results[start:start + self.page_size], start + self.page_size < len(results)
+
+    # ----------- Place Details -----------
+    def details(self, place_id: str, fields: list):
+        base_id = place_id.split("-")[0]
+        salt = _stable_int(place_id)
+        result = {"place_id": place_id}
+        if "photos" in fields:
+            refs = self.photo_refs.get(base_id) or [f"benchphoto{salt % 997}"]
+            result["photos"] = [{"photo_reference": ref} for ref in refs]
+        if "reviews" in fields:
+            n = len(self.reviews)
+            result["reviews"] = [{"text": self.reviews[(salt + k) % n]} for k in range(min(5, n))]
+        if "name" in fields:
+            result["name"] = f"Place {salt % 1000}"
+        return result
+
+    # ----------- Gemini -----------
+    def llm_text(self, prompt: str):
+        if "summary" in prompt.lower() and "itinerary" not in prompt.lower():
+            return self.summaries[_stable_int(prompt) % len(self.summaries)]
+        return self.itinerary_text
@@ -0,0 +1,105 @@
+# bench/payloads.py
+"""
+Payload size and serialization time for the recorded responses in ResponseSamples/,
+comparing the default FastAPI path with the compact view, orjson and compression.
+
+    python -m bench.payloads
+    python -m bench.payloads --repeat 2000 --out bench/results/payloads.json
+
+before   response_model validation + jsonable_encoder + json.dumps (FastAPI defaults)
+full     orjson, no projection
+compact  view=compact projection + orjson
+"""
+import os, sys, json, gzip, time, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from bench.fixtures import SAMPLES_DIR, ITINERARY_SAMPLE, SENTIMENT_SAMPLES
+from models.schemas import ItineraryResponse
+from services.payloads import dumps, compact_itinerary, compact_sentiment, brotli, GZIP_LEVEL, BROTLI_QUALITY
+
+
+def _load(name: str):
+    with open(os.path.join(SAMPLES_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _stdlib(payload):
+    # Same settings as starlette.responses.JSONResponse.render
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def _compact_analyze(payload: dict):
+    return {**payload, "sentiment": compact_sentiment(payload["sentiment"])} if "sentiment" in payload else payload
+
+
+def samples():
+    """(name, payload, serialize_before, compact) per recorded response."""
+    itinerary = _load(ITINERARY_SAMPLE)
+    yield (
+        "itinerary",
+        itinerary,
+        lambda p: _stdlib(jsonable_encoder(ItineraryResponse.model_validate(p))),
+        compact_itinerary,
+    )
+    for name in SENTIMENT_SAMPLES:
+        data = _load(name)
+        compact = _compact_analyze if "sentiment" in data else compact_sentiment
+        yield name.replace("response_", "").replace(".json", ""), data, lambda p: _stdlib(jsonable_encoder(p)), compact
+
+
+def _time_us(fn, payload, repeat: int):
+    fn(payload)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(payload)
+    return round((time.perf_counter() - start) / repeat * 1e6, 1)
+
+
+def _sizes(body: bytes):
+    sizes = {"raw": len(body), "gzip": len(gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0))}
+    if brotli is not None:
+        sizes["br"] = len(brotli.compress(body, quality=BROTLI_QUALITY))
+    return sizes
+
+
+def measure(repeat: int):
+    results = {}
+    for name, payload, before, compact in samples():
+        variants = {
+            "before": before,
+            "full": dumps,
+            "compact": lambda p, compact=compact: dumps(compact(p)),
+        }
+        results[name] = {
+            variant: {"serialize_us": _time_us(fn, payload, repeat), "bytes": _sizes(fn(payload))}
+            for variant, fn in variants.items()
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response payload size / serialization benchmark.")
+    parser.add_argument("--repeat", type=int, default=500, help="Serializations timed per variant")
+    parser.add_argument("--out", help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = measure(args.repeat)
+    codings = ["raw", "gzip"] + (["br"] if brotli is not None else [])
+    print(f"{'payload':<34}{'variant':<9}{'serialize µs':>13}" + "".join(f"{c + ' B':>10}" for c in codings))
+    for name, variants in results.items():
+        for variant, r in variants.items():
+            print(f"{name:<34}{variant:<9}{r['serialize_us']:>13}"
+                  + "".join(f"{r['bytes'][c]:>10}" for c in codings))
+    if brotli is None:
+        print("\n(brotli not installed: `pip install brotli` to measure and serve Content-Encoding: br)")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"repeat": args.repeat, "payloads": results}, f, indent=2)
+        print(f"\nsaved {args.out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+# bench/run.py
+"""
+Offline load benchmark: the API runs against a local fake Places server and a
+fake Gemini model, so results are reproducible and cost nothing.
+
+    python -m bench.run                                   # all scenarios, default settings
+    python -m bench.run itinerary --requests 500 --concurrency 32
+    python -m bench.run --places-latency-ms 150 --places-error-rate 0.05
+    python -m bench.run --compare bench/results/baseline.json
+
+Each run writes bench/results/<timestamp>_<commit>.json with p50/p95/p99 latency,
+throughput and outbound call counts per scenario; --compare prints the change
+against an earlier result file.
+"""
+import os, sys, json, time, random, socket, asyncio, argparse, subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from bench.fixtures import Fixtures, DESTINATIONS
+from bench.fakes import FakePlacesServer, Latency
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+SCENARIOS = ("itinerary", "sentiment_place", "sentiment_analyze")
+
+
+# ----------- Request mixes -----------
+def _pool(build, size: int, rng: random.Random):
+    """`size` distinct requests; a smaller pool means more repeats (cache hits)."""
+    return [build(i, rng) for i in range(max(1, size))]
+
+
+def itinerary_requests(n: int, unique: float, rng: random.Random):
+    def build(i, rng):
+        body = {
+            "destination": DESTINATIONS[i % len(DESTINATIONS)],
+            "days": 1 + (i // len(DESTINATIONS)) % 4,
+            "budget": 1 + (i // (4 * len(DESTINATIONS))) % 4,
+            "kid_friendly": bool(i % 3 == 0),
+        }
+        return ("POST", "/itinerary/generate", {"json": body})
+    pool = _pool(build, int(n * unique), rng)
+    return [rng.choice(pool) for _ in range(n)]
+
+
+def sentiment_place_requests(n: int, unique: float, rng: random.Random, fixtures: Fixtures):
+    ids = [p["place_id"] for p in fixtures.sample_places] + [p["place_id"] for p in fixtures.attractions]
+
+    def build(i, rng):
+        pid = ids[i % len(ids)] + ("" if i < len(ids) else f"-v{i}")
+        return ("GET", f"/sentiment/{pid}", {})
+    pool = _pool(build, int(n * unique), rng)
+    return [rng.choice(pool) for _ in range(n)]
+
+
+def sentiment_analyze_requests(n: int, unique: float, rng: random.Random, fixtures: Fixtures):
+    names = [p["name"] for p in fixtures.attractions + fixtures.restaurants]
+
+    def build(i, rng):
+        query = f"{names[i % len(names)]} {DESTINATIONS[(i // len(names)) % len(DESTINATIONS)]}"
+        return ("GET", "/sentiment/analyze", {"params": {"query": query}})
+    pool = _pool(build, int(n * unique), rng)
+    return [rng.choice(pool) for _ in range(n)]
+
+
+# ----------- Measurement -----------
+def percentile(sorted_values: list, p: float):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def parse_metrics(text: str):
+    """Sum Prometheus samples per metric name + label set (only the ones the report needs)."""
+    out = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name_labels, _, value = line.rpartition(" ")
+        if name_labels.startswith(("llm_", "upstream_requests_total", "cache_lookups_total")):
+            out[name_labels] = float(value)
+    return out
+
+
+def metrics_delta(before: dict, after: dict):
+    delta = {k: after.get(k, 0) - before.get(k, 0) for k in after}
+    llm_calls = sum(v for k, v in delta.items() if k.startswith("llm_calls_total"))
+    tokens = {
+        kind: int(sum(v for k, v in delta.items() if k.startswith("llm_tokens_total") and f'kind="{kind}"' in k))
+        for kind in ("prompt", "output")
+    }
+    upstream = {}
+    for k, v in delta.items():
+        if k.startswith("upstream_requests_total") and v:
+            endpoint = k.split('endpoint="')[1].split('"')[0]
+            outcome = k.split('outcome="')[1].split('"')[0]
+            upstream.setdefault(endpoint, {})[outcome] = int(v)
+    caches = {}
+    for k, v in delta.items():
+        if k.startswith("cache_lookups_total"):
+            cache = k.split('cache="')[1].split('"')[0]
+            result = k.split('result="')[1].split('"')[0]
+            caches.setdefault(cache, {"hit": 0, "miss": 0})[result] = int(v)
+    hit_rates = {name: round(c["hit"] / (c["hit"] + c["miss"]), 3)
+                 for name, c in caches.items() if c["hit"] + c["miss"]}
+    return {"gemini_calls": int(llm_calls), "gemini_tokens": tokens,
+            "client_upstream": upstream, "cache_hit_rate": hit_rates}
+
+
+async def run_scenario(base_url: str, requests: list, concurrency: int, timeout: float):
+    latencies, statuses, errors = [], {}, 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+        async def one(method, path, kwargs):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    resp = await client.request(method, path, **kwargs)
+                    status = resp.status_code
+                except httpx.HTTPError:
+                    status = "transport_error"
+                latencies.append((time.perf_counter() - start) * 1000)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                if status != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(*r) for r in requests))
+        wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(requests),
+        "concurrency": concurrency,
+        "errors": errors,
+        "status_counts": statuses,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(requests) / wall, 2) if wall else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "mean": round(sum(latencies) / len(latencies), 1),
+            "max": round(latencies[-1], 1),
+        },
+    }
+
+
+# ----------- App process -----------
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(args, places_url: str, port: int):
+    env = dict(os.environ)
+    env.update({
+        "GOOGLE_MAPS_BASE_URL": places_url,
+        "GOOGLE_PLACES_API_KEY": "bench",
+        "GEMINI_API_KEY": "bench",
+        # Fresh in-memory caches every run, whatever the local .env says
+        "CACHE_BACKEND": "memory",
+        "GEMINI_CACHE_BACKEND": "memory",
+        "SENTIMENT_CACHE_BACKEND": "memory",
+        "POI_STORE_ENABLED": "false",
+        "SENTIMENT_WARMUP": "false",
+        "SENTIMENT_WORKERS": "0",
+        "PHOTO_CACHE_DIR": os.path.join(RESULTS_DIR, ".photo_cache"),
+    })
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    cmd = [
+        sys.executable, "-m", "bench.serve", "--port", str(port),
+        "--gemini-latency-ms", str(args.gemini_latency_ms),
+        "--gemini-jitter-ms", str(args.gemini_jitter_ms),
+        "--gemini-error-rate", str(args.gemini_error_rate),
+        "--places-per-query", str(args.places_per_query),
+        "--seed", str(args.seed),
+    ]
+    if not args.real_sentiment:
+        cmd += ["--fake-sentiment-ms", str(args.fake_sentiment_ms)]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env)
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("API process exited during startup")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("API did not start within 60s")
+
+
+def _commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+# ----------- Comparison -----------
+def compare(baseline: dict, current: dict):
+    print(f"\nvs {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+    print(f"{'scenario':<20}{'metric':<16}{'before':>10}{'after':>10}{'change':>10}")
+    for name, cur in current["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if not old:
+            continue
+        rows = [(f"{p} ms", old["latency_ms"][p], cur["latency_ms"][p]) for p in ("p50", "p95", "p99")]
+        rows.append(("throughput rps", old["throughput_rps"], cur["throughput_rps"]))
+        rows.append(("gemini calls", old["outbound"]["gemini_calls"], cur["outbound"]["gemini_calls"]))
+        rows.append(("places calls", old["outbound"]["places_calls"], cur["outbound"]["places_calls"]))
+        for metric, before, after in rows:
+            change = f"{(after - before) / before * 100:+.1f}%" if before else "-"
+            print(f"{name:<20}{metric:<16}{before:>10}{after:>10}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline API benchmark with fake Places and Gemini.")
+    parser.add_argument("scenarios", nargs="*", default=list(SCENARIOS), help=f"Any of {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--unique", type=float, default=0.5,
+                        help="Distinct requests as a fraction of --requests (lower = more cache hits)")
+    parser.add_argument("--places-latency-ms", type=float, default=80)
+    parser.add_argument("--places-jitter-ms", type=float, default=40)
+    parser.add_argument("--places-error-rate", type=float, default=0.0)
+    parser.add_argument("--places-per-query", type=int, default=20,
+                        help="Text Search results per query (more than 20 exercises pagination)")
+    parser.add_argument("--gemini-latency-ms", type=float, default=800)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=200)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--fake-sentiment-ms", type=float, default=2.0, help="Per-review cost of the fake model")
+    parser.add_argument("--real-sentiment", action="store_true", help="Use the real sentiment model")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--env", action="append", default=[], help="Extra KEY=VALUE for the API process")
+    parser.add_argument("--out", help="Result file (default bench/results/<timestamp>_<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    fixtures = Fixtures(places_per_query=args.places_per_query)
+    places = FakePlacesServer(
+        fixtures, Latency(args.places_latency_ms, args.places_jitter_ms, args.places_error_rate, seed=args.seed)
+    ).start()
+    port = _free_port()
+    app = start_app(args, places.base_url, port)
+    base_url = f"http://127.0.0.1:{port}"
+
+    rng = random.Random(args.seed)
+    builders = {
+        "itinerary": lambda: itinerary_requests(args.requests, args.unique, rng),
+        "sentiment_place": lambda: sentiment_place_requests(args.requests, args.unique, rng, fixtures),
+        "sentiment_analyze": lambda: sentiment_analyze_requests(args.requests, args.unique, rng, fixtures),
+    }
+
+    results = {}
+    try:
+        for name in args.scenarios:
+            requests = builders[name]()
+            places.reset_counts()
+            before = parse_metrics(httpx.get(f"{base_url}/metrics").text)
+            result = asyncio.run(run_scenario(base_url, requests, args.concurrency, args.timeout))
+            after = parse_metrics(httpx.get(f"{base_url}/metrics").text)
+
+            served = places.reset_counts()
+            outbound = metrics_delta(before, after)
+            outbound["places"] = served
+            outbound["places_calls"] = sum(c["calls"] for c in served.values())
+            result["outbound"] = outbound
+            results[name] = result
+
+            lat = result["latency_ms"]
+            print(f"{name:<20} p50 {lat['p50']:>8} ms  p95 {lat['p95']:>8} ms  p99 {lat['p99']:>8} ms  "
+                  f"{result['throughput_rps']:>7} rps  errors {result['errors']}  "
+                  f"places {outbound['places_calls']}  gemini {outbound['gemini_calls']}")
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+        places.stop()
+
+    report = {
+        "meta": {
+            "commit": _commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        },
+        "scenarios": results,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{report['meta']['commit']}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nsaved {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+# bench/serve.py
+"""
+Run the API with Gemini (and optionally the sentiment model) replaced by local fakes.
+Started by bench/run.py; Places calls go to GOOGLE_MAPS_BASE_URL (the fake server).
+
+    python -m bench.serve --port 8765
+"""
+import os, sys, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API under benchmark, with fake Gemini.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--gemini-latency-ms", type=float, default=800)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=200)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--fake-sentiment-ms", type=float, default=None,
+                        help="Replace the sentiment model with a lexicon scorer costing this many ms per review")
+    parser.add_argument("--places-per-query", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+    from bench.fixtures import Fixtures
+    from bench.fakes import FakeGeminiModel, FakeSentimentPipeline, Latency
+    from services import gemini_service, sentiment_service
+
+    fixtures = Fixtures(places_per_query=args.places_per_query)
+    latency = Latency(args.gemini_latency_ms, args.gemini_jitter_ms, args.gemini_error_rate, seed=args.seed)
+    gemini_service.get_model = lambda name=None: FakeGeminiModel(fixtures, latency)
+    if args.fake_sentiment_ms is not None:
+        sentiment_service._pipeline = FakeSentimentPipeline(args.fake_sentiment_ms)
+
+    from app import app
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,7 @@ from typing import List, Dict, Any, Optional
 # Request body model
 class ItineraryRequest(BaseModel):
     destination: str = Field(..., example="Toronto")
-    days: int = Field(..., example=3)
+    days: int = Field(..., ge=1, le=30, example=3)
     budget: int = Field(..., example=2, description="0=Free, 1=Inexpensive, 2=Moderate, 3=Expensive, 4=Luxury")
     kid_friendly: bool = Field(False, example=True)
     travel_type: Optional[str] = Field(None, example="couple", description="solo | couple | family | friends")
@@ -20,6 +20,9 @@ class ItineraryDay(BaseModel):
     restaurants: List[Dict[str, Any]] = Field(
         ..., example=[{"name": "Pizzeria Libretto", "rating": 4.5, "price_level": 1}]
     )
+    distance_km: Optional[float] = Field(
+        None, example=6.4, description="Straight-line km along the day's ordered attraction route"
+    )
 
 
 # Full response model
@@ -50,3 +53,33 @@ class ItineraryResponse(BaseModel):
             }
         ]
     )
+    prompt_tokens: Optional[int] = Field(
+        None, example=640, description="Estimated Gemini prompt size for this request"
+    )
+    degraded: bool = Field(
+        False, example=False, description="True when Gemini was unavailable and itinerary_text is a plain outline"
+    )
+
+
+# Background itinerary job (POST /itinerary/jobs, GET /itinerary/jobs/{job_id})
+class ItineraryJob(BaseModel):
+    job_id: str = Field(..., example="3f2b9c0e5d7a4e1f9b6c8d2a1e0f4b7c")
+    status: str = Field(..., example="generating", description="queued | running | planning | generating | done | error")
+    status_url: str = Field(..., example="/itinerary/jobs/3f2b9c0e5d7a4e1f9b6c8d2a1e0f4b7c")
+    created_at: float = Field(..., example=1760000000.0)
+    started_at: Optional[float] = Field(None, example=1760000000.2)
+    finished_at: Optional[float] = Field(None, example=None)
+    plan_struct: Optional[List[ItineraryDay]] = Field(
+        None, description="Available once places are planned, before the itinerary text"
+    )
+    result: Optional[ItineraryResponse] = Field(None, description="Full /generate response when done")
+    error: Optional[str] = Field(None, example=None)
+
+
+# Batch sentiment request body
+class SentimentBatchRequest(BaseModel):
+    place_ids: List[str] = Field(..., example=["ChIJE-Xa87o0K4gRkvXFHuE0hMk"])
+    place_names: Optional[Dict[str, str]] = Field(
+        None, example={"ChIJE-Xa87o0K4gRkvXFHuE0hMk": "Royal Ontario Museum"},
+        description="Optional place_id -> name map used in the human summaries"
+    )
@@ -1,7 +1,19 @@
-from fastapi import APIRouter, HTTPException
-from models.schemas import ItineraryRequest, ItineraryResponse
-from services.places_service import fetch_pois_for_destination
-from services.gemini_service import generate_itinerary_text, BUDGET_DESC
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from models.schemas import ItineraryRequest, ItineraryResponse, ItineraryJob
+from services.places_service import (
+    fetch_pois_for_destination_async, _enrich_photos_async, ATTRACTIONS_PER_DAY, RESTAURANTS_PER_DAY
+)
+from services.planner import plan_days
+from services.metrics import timed
+from services.cache import normalize_key
+from services.singleflight import AsyncSingleFlight
+from services.jobs import JobQueue, JobQueueFull
+from services.gemini_service import build_itinerary_prompt, generate_text_async, stream_text_async, BUDGET_DESC
+from services.place_details import details_scope
+from services.resilience import record_fallback, deadline_scope
+from services.payloads import Shape, compact_itinerary
 
 router = APIRouter()
 
@@ -13,70 +25,235 @@ BUDGET_LABELS = {
     4: "Luxury"
 }
 
+# Concurrent identical requests share one Places + Gemini computation
+plan_flight = AsyncSingleFlight("itinerary_plan")
+generate_flight = AsyncSingleFlight("itinerary_generate")
+
+
+def itinerary_request_key(req: ItineraryRequest):
+    """Normalized identity of an itinerary request (case/whitespace-insensitive)."""
+    return normalize_key(
+        req.destination, req.days, req.budget, req.kid_friendly,
+        req.travel_type or "-", req.activity_theme or "-"
+    )
+
+
+async def _build_plan(req: ItineraryRequest):
+    """Fetch POIs and lay them out day by day (no LLM text yet)."""
+    # --- Step 1. Fetch POI candidates (Places of Interest), filtered and ranked;
+    #     extra Text Search pages are only fetched when filters leave too few ---
+    pois = await fetch_pois_for_destination_async(
+        destination=req.destination,
+        max_results_per_type=max(20, req.days * ATTRACTIONS_PER_DAY),
+        kid_friendly=req.kid_friendly,
+        budget=req.budget,
+        travel_type=req.travel_type,
+        activity_theme=req.activity_theme,
+        days=req.days,
+        enrich_photos=False
+    )
+
+    # --- Step 2. Group attractions into compact days, order each day's route,
+    #     and attach the nearest restaurants ---
+    with timed("itinerary.plan_days"):
+        itinerary_struct = plan_days(
+            pois["attractions"], pois["restaurants"], req.days,
+            attractions_per_day=ATTRACTIONS_PER_DAY, restaurants_per_day=RESTAURANTS_PER_DAY
+        )
+
+    # --- Step 3. Photos only for the places that made it into the plan ---
+    chosen = [p for day in itinerary_struct for p in day["attractions"] + day["restaurants"]]
+    await _enrich_photos_async(chosen, max_photos=5)
+
+    # Keep place_id for later sentiment fetch in frontend or /sentiment/{id}
+    for place in chosen:
+        place.pop("sentiment", None)  # remove any previous sentiment field
+
+    return itinerary_struct
+
+
+def _response_header(req: ItineraryRequest):
+    return {
+        "destination": req.destination,
+        "days": req.days,
+        "budget": req.budget,
+        "budget_label": BUDGET_LABELS.get(req.budget, "Unknown"),
+        "budget_description": BUDGET_DESC.get(req.budget, "Moderately priced options"),
+        "kid_friendly": req.kid_friendly,
+    }
+
+
+def _prompt_for(req: ItineraryRequest, itinerary_struct: list):
+    """Compact, token-budgeted Gemini prompt; returns (prompt, prompt_tokens)."""
+    return build_itinerary_prompt(
+        destination=req.destination,
+        days=req.days,
+        budget=req.budget,
+        kid_friendly=req.kid_friendly,
+        plan_struct=itinerary_struct,
+        travel_type=req.travel_type,
+        activity_theme=req.activity_theme
+    )
+
+
+def _fallback_text(req: ItineraryRequest, itinerary_struct: list):
+    """Plain day-by-day outline of the plan, returned when Gemini is unavailable."""
+    lines = [f"{req.days}-day itinerary for {req.destination}"]
+    for day in itinerary_struct:
+        lines.append(f"\nDay {day['day']}:")
+        lines.extend(f"- Visit {p['name']}" for p in day["attractions"])
+        lines.extend(f"- Eat at {p['name']}" for p in day["restaurants"])
+    return "\n".join(lines)
+
+
+def _sse(event: str, data: dict):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _generate(req: ItineraryRequest, no_cache: bool, itinerary_struct: list = None):
+    if itinerary_struct is None:
+        itinerary_struct = await plan_flight.do(itinerary_request_key(req), _build_plan, req)
+
+    # --- Step 4. Generate natural language itinerary using Gemini
+    #     (a plain outline of the plan if Gemini fails or its breaker is open) ---
+    prompt, prompt_tokens = _prompt_for(req, itinerary_struct)
+    degraded = False
+    try:
+        text = await generate_text_async(prompt, use_cache=not no_cache)
+    except Exception:
+        record_fallback("gemini", "degraded")
+        text, degraded = _fallback_text(req, itinerary_struct), True
+
+    # --- Step 5. Return structured response ---
+    return {
+        **_response_header(req),
+        "itinerary_text": text,
+        "plan_struct": itinerary_struct,
+        "prompt_tokens": prompt_tokens,
+        "degraded": degraded
+    }
+
 
 @router.post("/generate", response_model=ItineraryResponse)
-def generate(req: ItineraryRequest):
+async def generate(req: ItineraryRequest,
+                   no_cache: bool = Query(False, description="Bypass the cached Gemini response"),
+                   shape: Shape = Depends()):
     """
     Generate itinerary using Google Places (with photos) and Gemini LLM.
+    Identical requests already in flight share one computation.
+    `view=compact` / `fields=` shrink the response; large bodies are gzip/brotli compressed.
     """
     try:
-        # --- Step 1. Fetch POIs (Places of Interest) ---
-        pois = fetch_pois_for_destination(
-            destination=req.destination,
-            max_results_per_type=20,
-            kid_friendly=req.kid_friendly,
-            budget=req.budget,
-            travel_type=req.travel_type,
-            activity_theme=req.activity_theme
-        )
+        key = normalize_key(itinerary_request_key(req), "no_cache" if no_cache else "")
+        return shape.respond(await generate_flight.do(key, _generate, req, no_cache), compact_itinerary)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # --- Step 2. Sort places by rating & popularity ---
-        attractions = sorted(
-            pois["attractions"], key=lambda x: (x.get("rating", 0), x.get("user_ratings_total", 0)), reverse=True
-        )
-        restaurants = sorted(
-            pois["restaurants"], key=lambda x: (x.get("rating", 0), x.get("user_ratings_total", 0)), reverse=True
-        )
 
-        # --- Step 3. Build itinerary structure (without sentiment) ---
-        per_day = 4
-        itinerary_struct = []
-        for d in range(req.days):
-            day_atts = attractions[d * per_day:(d + 1) * per_day]
-            day_rests = restaurants[d * 2:(d + 1) * 2]
-
-            # Keep place_id for later sentiment fetch in frontend or /sentiment/{id}
-            for place in day_atts + day_rests:
-                place.pop("sentiment", None)  # remove any previous sentiment field
-
-            itinerary_struct.append({
-                "day": d + 1,
-                "attractions": day_atts,
-                "restaurants": day_rests
-            })
-
-        # --- Step 4. Generate natural language itinerary using Gemini ---
-        text = generate_itinerary_text(
-            destination=req.destination,
-            days=req.days,
-            budget=req.budget,
-            kid_friendly=req.kid_friendly,
-            plan_struct=itinerary_struct,
-            travel_type=req.travel_type,
-            activity_theme=req.activity_theme
-        )
+async def _run_job(job: dict, req: ItineraryRequest, no_cache: bool):
+    """Job handler: publishes plan_struct as soon as it is ready, then the full response."""
+    with details_scope():
+        job["status"] = "planning"
+        itinerary_struct = await plan_flight.do(itinerary_request_key(req), _build_plan, req)
+        job["plan_struct"] = itinerary_struct
+        job["status"] = "generating"
+        return await _generate(req, no_cache, itinerary_struct)
+
+
+itinerary_jobs = JobQueue("itinerary", _run_job)
+
 
-        # --- Step 5. Return structured response ---
-        return {
-            "destination": req.destination,
-            "days": req.days,
-            "budget": req.budget,
-            "budget_label": BUDGET_LABELS.get(req.budget, "Unknown"),
-            "budget_description": BUDGET_DESC.get(req.budget, "Moderately priced options"),
-            "kid_friendly": req.kid_friendly,
-            "itinerary_text": text,
-            "plan_struct": itinerary_struct
-        }
+def _compact_job(view: dict):
+    out = compact_itinerary(view)
+    if view["result"] is not None:
+        out["result"] = compact_itinerary(view["result"])
+    return out
 
+
+def _job_view(job: dict):
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/itinerary/jobs/{job['job_id']}",
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "plan_struct": job.get("plan_struct"),
+        "result": job["result"],
+        "error": job["error"],
+    }
+
+
+@router.post("/jobs", response_model=ItineraryJob, status_code=202)
+async def submit_job(req: ItineraryRequest,
+                     no_cache: bool = Query(False, description="Bypass the cached Gemini response"),
+                     shape: Shape = Depends()):
+    """
+    Queue an itinerary and return a job id immediately; poll GET /itinerary/jobs/{job_id}.
+    Resubmitting the same request returns the existing job. 429 when the queue is full.
+    """
+    key = normalize_key(itinerary_request_key(req), "no_cache" if no_cache else "")
+    try:
+        job, _ = itinerary_jobs.submit(key, req, no_cache)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "10"})
+    return shape.respond(_job_view(job), _compact_job, status_code=202)
+
+
+@router.get("/jobs/{job_id}", response_model=ItineraryJob)
+async def get_job(job_id: str, shape: Shape = Depends()):
+    """
+    Job status: queued, running (picked up by a worker), planning, generating, done or error.
+    plan_struct is filled in once places are planned; result holds the full
+    /generate response when the job is done. Finished jobs expire after a while.
+    """
+    job = itinerary_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return shape.respond(_job_view(job), _compact_job)
+
+
+@router.post("/generate/stream")
+async def generate_stream(req: ItineraryRequest,
+                          no_cache: bool = Query(False, description="Bypass the cached Gemini response")):
+    """
+    Server-Sent Events version of /generate.
+    Emits `plan` (header fields + plan_struct) as soon as Places data is ready,
+    then `text` events with Gemini output chunks, then `done` (or `error`).
+    If Gemini fails before any text is sent, a plain outline is sent and `done` has degraded=true.
+    The request deadline covers planning; the Gemini stream gets a fresh one of its own.
+    """
+    try:
+        itinerary_struct = await plan_flight.do(itinerary_request_key(req), _build_plan, req)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    prompt, prompt_tokens = _prompt_for(req, itinerary_struct)
+
+    async def events():
+        yield _sse("plan", {
+            **_response_header(req), "plan_struct": itinerary_struct, "prompt_tokens": prompt_tokens
+        })
+        sent = False
+        try:
+            # Runs after the handler returned, so planning must not have used up its budget
+            with deadline_scope():
+                async for chunk in stream_text_async(prompt, use_cache=not no_cache):
+                    sent = True
+                    yield _sse("text", {"text": chunk})
+        except Exception as e:
+            if sent:
+                yield _sse("error", {"detail": str(e)})
+                return
+            # Nothing streamed yet: send the plain outline instead
+            record_fallback("gemini", "degraded")
+            yield _sse("text", {"text": _fallback_text(req, itinerary_struct)})
+            yield _sse("done", {"degraded": True})
+            return
+        yield _sse("done", {})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,41 @@
+import httpx
+from fastapi import APIRouter, HTTPException, Path, Query, Request
+from fastapi.responses import FileResponse, Response
+from services.photo_cache import (
+    get_photo, photo_key, snap_width, etag_for, etag_matches, media_type_for, PHOTO_MAX_AGE
+)
+from services.resilience import CircuitOpenError, DeadlineExceeded, BREAKER_RESET
+
+router = APIRouter()
+
+
+@router.get("/{photo_reference}")
+async def photo(request: Request,
+                photo_reference: str = Path(..., pattern=r"^[A-Za-z0-9_-]+$", max_length=2048),
+                w: int = Query(None, ge=1, le=4800, description="Requested width; snapped to 400, 800 or 1600")):
+    """
+    Serve a Google Places photo through the local disk cache.
+    The first request downloads the image; later ones are served from disk.
+    The ETag depends only on the reference and width, so a matching
+    If-None-Match gets a 304 without touching the cache or Google.
+    """
+    width = snap_width(w)
+    headers = {
+        "ETag": etag_for(photo_key(photo_reference, width)),
+        "Cache-Control": f"public, max-age={PHOTO_MAX_AGE}, immutable",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        _, path = await get_photo(photo_reference, width)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code in (400, 403, 404):
+            raise HTTPException(status_code=404, detail="Photo not found")
+        raise HTTPException(status_code=500, detail=str(e))
+    except (CircuitOpenError, DeadlineExceeded) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(BREAKER_RESET))})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return FileResponse(path, media_type=media_type_for(path), headers=headers)
@@ -1,12 +1,31 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from models.schemas import SentimentBatchRequest
 from services.places_service import _text_search, _normalize
-from services.sentiment_service import get_sentiment_insights, get_place_reviews
+from services.singleflight import SingleFlight
+from services.payloads import Shape, compact_sentiment, dumps
+from services.sentiment_service import (
+    get_sentiment_insights, get_place_reviews, score_sentiment_batch, iter_sentiment_insights_batch
+)
 
 router = APIRouter()
 
+MAX_BATCH_PLACES = 50
+
+# Concurrent lookups of the same place share one Details + model + Gemini run
+insights_flight = SingleFlight("sentiment_insights")
+
+
+def _compact_analyze(payload: dict):
+    if "sentiment" not in payload:
+        return payload
+    return {**payload, "sentiment": compact_sentiment(payload["sentiment"])}
+
 
 @router.get("/analyze")
-def sentiment_by_name(query: str = Query(..., description="Place name or location to analyze")):
+def sentiment_by_name(query: str = Query(..., description="Place name or location to analyze"),
+                      no_cache: bool = Query(False, description="Bypass the cached Gemini summary"),
+                      shape: Shape = Depends()):
     """
     Analyze sentiment for a given place name using Google Places search.
     Example: /sentiment/analyze?query=CN Tower Toronto
@@ -16,7 +35,7 @@ def sentiment_by_name(query: str = Query(..., description="Place name or locatio
         if not search_results:
             raise HTTPException(status_code=404, detail=f"No places found for '{query}'.")
 
-        places = _normalize(search_results, enrich_photos=False)
+        places = _normalize(search_results)
 
         # Try each place until one has reviews
         for place in places[:5]:
@@ -26,8 +45,10 @@ def sentiment_by_name(query: str = Query(..., description="Place name or locatio
 
             reviews = get_place_reviews(pid)
             if reviews:
-                sentiment = get_sentiment_insights(pid, place_name=place.get("name"))
-                return {
+                sentiment = get_sentiment_insights(
+                    pid, place_name=place.get("name"), reviews=reviews, use_cache=not no_cache
+                )
+                return shape.respond({
                     "place": {
                         "name": place.get("name"),
                         "address": place.get("address"),
@@ -36,10 +57,10 @@ def sentiment_by_name(query: str = Query(..., description="Place name or locatio
                         "place_id": pid
                     },
                     "sentiment": sentiment
-                }
+                }, _compact_analyze)
 
         # None had reviews
-        return {
+        return shape.respond({
             "message": f"No public reviews found for '{query}'.",
             "suggestion": "Try a more specific place name (e.g., 'Space Needle Seattle').",
             "possible_matches": [
@@ -51,16 +72,51 @@ def sentiment_by_name(query: str = Query(..., description="Place name or locatio
                 }
                 for p in places[:5]
             ]
-        }
+        })
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 
+@router.post("/batch")
+def sentiment_batch(req: SentimentBatchRequest,
+                    no_cache: bool = Query(False, description="Bypass cached Gemini summaries"),
+                    shape: Shape = Depends()):
+    """
+    Sentiment summaries for many places in one call.
+    Streams one JSON object per line (NDJSON) as each place finishes; a failed
+    place yields {"place_id": ..., "error": ...} without stopping the others.
+    Reviews are fetched and scored before streaming starts, so a model failure is a 500;
+    each place's Gemini summary then gets a request deadline of its own.
+    """
+    place_ids = list(dict.fromkeys(pid for pid in req.place_ids if pid))
+    if not place_ids:
+        raise HTTPException(status_code=400, detail="place_ids must not be empty.")
+    if len(place_ids) > MAX_BATCH_PLACES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_PLACES} place_ids per batch.")
+
+    try:
+        scored = score_sentiment_batch(place_ids)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    lines = (
+        dumps(shape.project(item, compact_sentiment)) + b"\n"
+        for item in iter_sentiment_insights_batch(
+            place_ids, place_names=req.place_names, use_cache=not no_cache, scored=scored
+        )
+    )
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
 
 @router.get("/{place_id}")
-def sentiment_by_id(place_id: str):
-    """Get sentiment summary for a specific Google Place ID."""
+def sentiment_by_id(place_id: str,
+                    no_cache: bool = Query(False, description="Bypass the cached Gemini summary"),
+                    shape: Shape = Depends()):
+    """Get sentiment summary for a specific Google Place ID (`view=compact` shortens the samples)."""
     try:
-        return get_sentiment_insights(place_id)
+        key = f"{place_id}|no_cache" if no_cache else place_id
+        insights = insights_flight.do(key, get_sentiment_insights, place_id, use_cache=not no_cache)
+        return shape.respond(insights, compact_sentiment)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
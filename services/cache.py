@@ -0,0 +1,214 @@
+# services/cache.py
+import os, json, time, sqlite3, threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Backend for response caches: "memory" (default) or "sqlite" (survives restarts)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_PATH = os.getenv("CACHE_PATH", "cache.sqlite3")
+
+# Returned by get() when a key is absent or expired
+MISS = object()
+
+# name -> cache, so stats can be reported in one place
+_registry = {}
+
+
+class TTLCache:
+    """In-process cache with per-entry TTL and size-bounded LRU eviction."""
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 3600):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return MISS
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value, ttl: float = None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class SQLiteCache:
+    """
+    On-disk cache with the same interface as TTLCache.
+    Values are stored as JSON; LRU order is kept with a last-access timestamp.
+    Access times are buffered and written in batches, and eviction trims a batch of
+    the least recently used rows once the namespace grows past maxsize.
+    """
+
+    # Buffered access times are written once this many are pending or this many seconds passed
+    ACCESS_FLUSH_SIZE = 256
+    ACCESS_FLUSH_INTERVAL = 5.0
+    # Fraction of maxsize removed per eviction, so evictions are rare and each one is cheap
+    EVICT_FRACTION = 0.05
+
+    def __init__(self, name: str, maxsize: int = 10000, ttl: float = 3600, path: str = CACHE_PATH):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " ns TEXT, key TEXT, value TEXT, expires_at REAL, accessed_at REAL,"
+            " PRIMARY KEY (ns, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_lru ON cache (ns, accessed_at)")
+        self._conn.commit()
+        self._size = self._count()
+        self._accessed = {}  # key -> last access time not yet written
+        self._flushed_at = time.monotonic()
+
+    def _count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM cache WHERE ns = ?", (self.name,)).fetchone()[0]
+
+    def _flush_access(self):
+        """Write buffered access times (caller holds the lock and commits)."""
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE cache SET accessed_at = ? WHERE ns = ? AND key = ?",
+                [(at, self.name, key) for key, at in self._accessed.items()],
+            )
+            self._accessed.clear()
+        self._flushed_at = time.monotonic()
+
+    def _evict(self):
+        """Drop the least recently used rows down to maxsize minus a batch (caller holds the lock)."""
+        self._flush_access()
+        # Re-count first: other processes may share the file
+        excess = self._count() - self.maxsize
+        if excess > 0:
+            batch = excess + int(self.maxsize * self.EVICT_FRACTION)
+            self._conn.execute(
+                "DELETE FROM cache WHERE ns = ? AND key IN ("
+                " SELECT key FROM cache WHERE ns = ? ORDER BY accessed_at LIMIT ?)",
+                (self.name, self.name, batch),
+            )
+        self._size = self._count()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE ns = ? AND key = ?", (self.name, key)
+            ).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM cache WHERE ns = ? AND key = ?", (self.name, key))
+                    self._conn.commit()
+                    self._accessed.pop(key, None)
+                    self._size -= 1
+                self.misses += 1
+                return MISS
+            self._accessed[key] = now
+            if (len(self._accessed) >= self.ACCESS_FLUSH_SIZE
+                    or time.monotonic() - self._flushed_at >= self.ACCESS_FLUSH_INTERVAL):
+                self._flush_access()
+                self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value, ttl: float = None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            exists = self._conn.execute(
+                "SELECT 1 FROM cache WHERE ns = ? AND key = ?", (self.name, key)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (ns, key, value, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (self.name, key, json.dumps(value), expires_at, now),
+            )
+            self._accessed.pop(key, None)
+            if not exists:
+                self._size += 1
+            if self._size > self.maxsize:
+                self._evict()
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE ns = ?", (self.name,))
+            self._conn.commit()
+            self._accessed.clear()
+            self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+def make_cache(name: str, maxsize: int = 1024, ttl: float = 3600, backend: str = None):
+    """Create (or return the existing) named cache using the configured backend."""
+    if name in _registry:
+        return _registry[name]
+    backend = backend or CACHE_BACKEND
+    if backend == "sqlite":
+        cache = SQLiteCache(name, maxsize=maxsize, ttl=ttl)
+    else:
+        cache = TTLCache(name, maxsize=maxsize, ttl=ttl)
+    _registry[name] = cache
+    return cache
+
+
+def get_cache_stats():
+    """Hit/miss counters for every registered cache."""
+    return {name: cache.stats() for name, cache in _registry.items()}
+
+
+def normalize_key(*parts):
+    """Build a cache key from case- and whitespace-insensitive parts."""
+    return "|".join(" ".join(str(p).lower().split()) for p in parts if p is not None)
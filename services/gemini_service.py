@@ -1,11 +1,128 @@
-import os, json
+import os, hashlib
 from dotenv import load_dotenv
-import google.generativeai as genai
+from services.cache import make_cache, MISS
+from services.prompt_builder import fit_plan
+from services.metrics import timed, record_llm_usage
+from services.resilience import get_breaker, check_deadline
 
 load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 
+# Prompt-hash keyed cache for LLM outputs (memory or sqlite backend)
+GEMINI_CACHE_TTL = float(os.getenv("GEMINI_CACHE_TTL", "3600"))
+GEMINI_CACHE_MAXSIZE = int(os.getenv("GEMINI_CACHE_MAXSIZE", "1024"))
+GEMINI_CACHE_BACKEND = os.getenv("GEMINI_CACHE_BACKEND") or None
+
+llm_cache = make_cache(
+    "gemini", maxsize=GEMINI_CACHE_MAXSIZE, ttl=GEMINI_CACHE_TTL, backend=GEMINI_CACHE_BACKEND
+)
+
+# The Gemini SDK is slow to import, so it is loaded and configured on first use
+_genai = None
+
+
+def get_model(name: str = MODEL):
+    """Return a GenerativeModel, importing and configuring the SDK once."""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        _genai = genai
+    return _genai.GenerativeModel(name)
+
+
+def _is_failure(e: Exception):
+    """Whether an SDK error says Gemini is unhealthy (a 4xx other than 429 does not)."""
+    code = getattr(e, "code", None)
+    return not (isinstance(code, int) and 400 <= code < 500 and code != 429)
+
+
+def _guard():
+    """Circuit breaker around one Gemini call."""
+    return get_breaker("gemini").guard(_is_failure)
+
+
+def _request_options():
+    """SDK timeout for the time left before the request deadline (none without a deadline)."""
+    left = check_deadline("gemini")
+    return {} if left is None else {"request_options": {"timeout": left}}
+
+
+def prompt_key(prompt: str, model_name: str = MODEL):
+    """Content address of a prompt (model name included, since outputs differ per model)."""
+    return hashlib.sha256(f"{model_name}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+def _cached(prompt: str, model_name: str, use_cache: bool):
+    """(cache key, cached text or MISS); use_cache=False always misses."""
+    key = prompt_key(prompt, model_name)
+    return key, (llm_cache.get(key) if use_cache else MISS)
+
+
+def _remember(key: str, response, model_name: str, text: str):
+    """Record a finished call's token usage and cache its text (never an empty one)."""
+    record_llm_usage(response, model_name)
+    # An empty answer (e.g. a safety-blocked candidate) would otherwise be served for the full TTL
+    if text:
+        llm_cache.set(key, text)
+    return text
+
+
+def generate_text(prompt: str, model_name: str = MODEL, use_cache: bool = True):
+    """
+    generate_content with the prompt-hash cache in front; use_cache=False forces a fresh call.
+    Raises CircuitOpenError while Gemini's breaker is open; the SDK timeout is the time
+    left before the request deadline.
+    """
+    key, cached = _cached(prompt, model_name, use_cache)
+    if cached is not MISS:
+        return cached
+
+    with _guard(), timed("gemini.generate"):
+        response = get_model(model_name).generate_content(prompt, **_request_options())
+    return _remember(key, response, model_name, response.text)
+
+
+async def generate_text_async(prompt: str, model_name: str = MODEL, use_cache: bool = True):
+    """Async version of generate_text."""
+    key, cached = _cached(prompt, model_name, use_cache)
+    if cached is not MISS:
+        return cached
+
+    with _guard(), timed("gemini.generate"):
+        response = await get_model(model_name).generate_content_async(prompt, **_request_options())
+    return _remember(key, response, model_name, response.text)
+
+
+def _chunk_text(chunk):
+    try:
+        return chunk.text
+    except ValueError:
+        # Chunks without text parts (e.g. safety/finish metadata)
+        return ""
+
+
+async def stream_text_async(prompt: str, model_name: str = MODEL, use_cache: bool = True):
+    """Yield generated text chunks; a cache hit is yielded as a single chunk."""
+    key, cached = _cached(prompt, model_name, use_cache)
+    if cached is not MISS:
+        yield cached
+        return
+
+    parts = []
+    with _guard(), timed("gemini.stream"):
+        response = await get_model(model_name).generate_content_async(
+            prompt, stream=True, **_request_options()
+        )
+        async for chunk in response:
+            text = _chunk_text(chunk)
+            if text:
+                parts.append(text)
+                yield text
+    # Only a fully streamed response is cached
+    _remember(key, response, model_name, "".join(parts))
+
+
 BUDGET_DESC = {
     0: "free or extremely low cost options only (parks, free museums, scenic walks)",
     1: "inexpensive options such as casual dining, cheap attractions, public transport",
@@ -15,17 +132,20 @@ BUDGET_DESC = {
 }
 
 
-def generate_itinerary_text(destination: str,
-                            days: int,
-                            budget: int,
-                            kid_friendly: bool,
-                            plan_struct: list,
-                            travel_type: str = None,
-                            activity_theme: str = None):
-    model = genai.GenerativeModel(MODEL)
+def build_itinerary_prompt(destination: str,
+                           days: int,
+                           budget: int,
+                           kid_friendly: bool,
+                           plan_struct: list,
+                           travel_type: str = None,
+                           activity_theme: str = None):
+    """
+    Build the itinerary prompt with a compact POI block sized to the token budget.
+    Returns (prompt, estimated_prompt_tokens).
+    """
     budget_text = BUDGET_DESC.get(budget, "moderately priced options")
 
-    prompt = f"""
+    header = f"""
 You are a professional travel planner. Create a {days}-day itinerary for {destination}.
 
 Constraints:
@@ -37,11 +157,9 @@ Constraints:
 - Mention prices appropriately (affordable, luxury, free entry).
 - Include one restaurant recommendation per day.
 - Keep descriptions natural, concise, and engaging.
-- Use ONLY the provided JSON data — do not invent extra places.
+- Use ONLY the places listed below — do not invent extra places.
 
-POI Data (JSON):
-{json.dumps(plan_struct, indent=2)}
+POI Data (one place per line: name | rating | price | type):
 """
-
-    response = model.generate_content(prompt)
-    return response.text
+    poi_block, prompt_tokens = fit_plan(plan_struct, header)
+    return header + poi_block + "\n", prompt_tokens
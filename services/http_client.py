@@ -0,0 +1,322 @@
+# services/http_client.py
+import os, time, random, threading, asyncio
+import requests
+import httpx
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from services.resilience import get_breaker, cap_timeout, check_deadline, hedged, ahedged, DeadlineExceeded
+
+load_dotenv()
+
+# Connection pool and retry tuning
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "8"))
+# Client-side Places rate limit, per endpoint and shared by the whole process
+# (0, the default, disables it; set it from the project's Places quota when needed)
+PLACES_QPS = float(os.getenv("PLACES_QPS", "0"))
+
+# Google Maps API host (overridable, e.g. to point at the offline benchmark server)
+MAPS_BASE_URL = os.getenv("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com").rstrip("/")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# (connect, read) timeouts per logical endpoint
+TIMEOUTS = {
+    "textsearch": (5, 30),
+    "details": (5, 20),
+    "photo": (5, 20),
+}
+DEFAULT_TIMEOUT = (5, 30)
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: allows `rate` calls per second with bursts up to `burst`.
+    A rate <= 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.capacity = float(burst if burst is not None else max(1, int(rate)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _reserve(self, max_wait: float = None):
+        """
+        Take one token and return how long the caller must wait before using it.
+        When that wait would exceed max_wait, no token is taken and None is returned.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if max_wait is not None and wait >= max_wait:
+                return None
+            self.tokens -= 1
+            return wait
+
+    def _wait(self, what: str):
+        """Reserve a token within the request deadline; DeadlineExceeded (and no token taken) otherwise."""
+        wait = self._reserve(check_deadline(what))
+        if wait is None:
+            raise DeadlineExceeded(f"{what}: rate limit wait would outlast the request deadline")
+        return wait
+
+    def acquire(self, what: str = "upstream call"):
+        wait = self._wait(what)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, what: str = "upstream call"):
+        wait = self._wait(what)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+# One limiter per endpoint, shared by every request in the process
+_limiters = {name: RateLimiter(PLACES_QPS) for name in TIMEOUTS}
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+_session = None
+_session_lock = threading.Lock()
+_async_client = None
+
+
+class UpstreamError(Exception):
+    """Raised when an upstream API keeps failing after all retries."""
+
+
+def _record(endpoint: str, key: str):
+    with _stats_lock:
+        counters = _stats.setdefault(endpoint, {"calls": 0, "retries": 0, "errors": 0})
+        counters[key] += 1
+
+
+def get_stats():
+    """Return outbound call/retry/error counters per endpoint."""
+    with _stats_lock:
+        return {name: dict(c) for name, c in _stats.items()}
+
+
+def get_session():
+    """Shared keep-alive session for all synchronous Google API calls."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get_async_client():
+    """Shared pooled client for async routes (created on first use)."""
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE)
+        )
+    return _async_client
+
+
+async def aclose():
+    """Close the async client (called on app shutdown)."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def _backoff(attempt: int, retry_after: str = None):
+    """Full-jitter exponential backoff, honouring Retry-After when the server sends it."""
+    if retry_after:
+        try:
+            return min(BACKOFF_MAX, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _retry_wait(endpoint: str, attempt: int, retry_after: str = None):
+    """Backoff before the next attempt; DeadlineExceeded when it would outlast the request deadline."""
+    delay = _backoff(attempt, retry_after)
+    left = check_deadline(endpoint or "upstream call")
+    if left is not None and delay >= left:
+        raise DeadlineExceeded(f"{endpoint}: no time left to retry before the request deadline")
+    return delay
+
+
+def _timeouts(endpoint: str):
+    """(connect, read) timeouts for one attempt, capped by the request deadline."""
+    connect, read = TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+    return cap_timeout(connect, endpoint or "upstream call"), cap_timeout(read, endpoint or "upstream call")
+
+
+def _is_failure(e: Exception):
+    """Whether an exception says the upstream is unhealthy (a 4xx other than 429 does not)."""
+    response = getattr(e, "response", None)
+    status = getattr(response, "status_code", None)
+    return status is None or status >= 500 or status == 429
+
+
+def _breaker(endpoint: str):
+    return get_breaker(f"places.{endpoint}" if endpoint else "places")
+
+
+def _should_retry(status_code: int, data: dict = None):
+    if status_code in RETRY_STATUSES:
+        return True
+    # Places reports quota errors inside a 200 response
+    return bool(data) and data.get("status") == "OVER_QUERY_LIMIT"
+
+
+def get_json(url: str, params: dict, endpoint: str = None, hedge_after: float = 0):
+    """
+    GET a JSON API through the pooled session with rate limiting and retries.
+    Fails fast with CircuitOpenError while the endpoint's breaker is open, and
+    never waits past the request deadline. With hedge_after > 0, an attempt that
+    has not answered after that many seconds gets a duplicate request.
+    """
+    with _breaker(endpoint).guard(_is_failure):
+        return _get_json(url, params, endpoint, hedge_after)
+
+
+def _get_json(url: str, params: dict, endpoint: str = None, hedge_after: float = 0):
+    limiter = _limiters.get(endpoint)
+    session = get_session()
+
+    def before_hedge():
+        if limiter:
+            limiter.acquire(endpoint or "upstream call")
+        _record(endpoint, "calls")
+
+    for attempt in range(MAX_RETRIES + 1):
+        if limiter:
+            limiter.acquire(endpoint or "upstream call")
+        timeout = _timeouts(endpoint)
+        _record(endpoint, "calls")
+        try:
+            resp = hedged(f"places.{endpoint}", hedge_after, session.get, url,
+                          params=params, timeout=timeout, before_hedge=before_hedge)
+            data = resp.json() if resp.status_code == 200 else None
+        except (requests.ConnectionError, requests.Timeout, ValueError):
+            if attempt == MAX_RETRIES:
+                _record(endpoint, "errors")
+                raise
+            time.sleep(_retry_wait(endpoint, attempt))
+            _record(endpoint, "retries")
+            continue
+
+        if _should_retry(resp.status_code, data) and attempt < MAX_RETRIES:
+            time.sleep(_retry_wait(endpoint, attempt, resp.headers.get("Retry-After")))
+            _record(endpoint, "retries")
+            continue
+
+        if resp.status_code != 200:
+            _record(endpoint, "errors")
+            resp.raise_for_status()
+        return data
+
+    _record(endpoint, "errors")
+    raise UpstreamError(f"{endpoint or url}: retries exhausted")
+
+
+async def aget_json(url: str, params: dict, endpoint: str = None, hedge_after: float = 0):
+    """Async counterpart of get_json for use from async routes."""
+    with _breaker(endpoint).guard(_is_failure):
+        return await _aget_json(url, params, endpoint, hedge_after)
+
+
+async def _aget_json(url: str, params: dict, endpoint: str = None, hedge_after: float = 0):
+    limiter = _limiters.get(endpoint)
+    client = get_async_client()
+
+    async def before_hedge():
+        if limiter:
+            await limiter.acquire_async(endpoint or "upstream call")
+        _record(endpoint, "calls")
+
+    for attempt in range(MAX_RETRIES + 1):
+        if limiter:
+            await limiter.acquire_async(endpoint or "upstream call")
+        connect, read = _timeouts(endpoint)
+        timeout = httpx.Timeout(read, connect=connect)
+        _record(endpoint, "calls")
+        try:
+            resp = await ahedged(f"places.{endpoint}", hedge_after, client.get, url,
+                                 params=params, timeout=timeout, before_hedge=before_hedge)
+            data = resp.json() if resp.status_code == 200 else None
+        except (httpx.TransportError, ValueError):
+            if attempt == MAX_RETRIES:
+                _record(endpoint, "errors")
+                raise
+            await asyncio.sleep(_retry_wait(endpoint, attempt))
+            _record(endpoint, "retries")
+            continue
+
+        if _should_retry(resp.status_code, data) and attempt < MAX_RETRIES:
+            await asyncio.sleep(_retry_wait(endpoint, attempt, resp.headers.get("Retry-After")))
+            _record(endpoint, "retries")
+            continue
+
+        if resp.status_code != 200:
+            _record(endpoint, "errors")
+            resp.raise_for_status()
+        return data
+
+    _record(endpoint, "errors")
+    raise UpstreamError(f"{endpoint or url}: retries exhausted")
+
+
+async def aget_bytes(url: str, params: dict, endpoint: str = None):
+    """
+    GET binary content (e.g. a Places photo) with the same rate limiting, retries,
+    breaker and deadline. Redirects are followed; returns (content, content_type).
+    """
+    with _breaker(endpoint).guard(_is_failure):
+        return await _aget_bytes(url, params, endpoint)
+
+
+async def _aget_bytes(url: str, params: dict, endpoint: str = None):
+    limiter = _limiters.get(endpoint)
+    client = get_async_client()
+
+    for attempt in range(MAX_RETRIES + 1):
+        if limiter:
+            await limiter.acquire_async(endpoint or "upstream call")
+        connect, read = _timeouts(endpoint)
+        timeout = httpx.Timeout(read, connect=connect)
+        _record(endpoint, "calls")
+        try:
+            resp = await client.get(url, params=params, timeout=timeout, follow_redirects=True)
+        except httpx.TransportError:
+            if attempt == MAX_RETRIES:
+                _record(endpoint, "errors")
+                raise
+            await asyncio.sleep(_retry_wait(endpoint, attempt))
+            _record(endpoint, "retries")
+            continue
+
+        if _should_retry(resp.status_code) and attempt < MAX_RETRIES:
+            await asyncio.sleep(_retry_wait(endpoint, attempt, resp.headers.get("Retry-After")))
+            _record(endpoint, "retries")
+            continue
+
+        if resp.status_code != 200:
+            _record(endpoint, "errors")
+            resp.raise_for_status()
+        return resp.content, resp.headers.get("Content-Type", "image/jpeg")
+
+    _record(endpoint, "errors")
+    raise UpstreamError(f"{endpoint or url}: retries exhausted")
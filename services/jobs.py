@@ -0,0 +1,136 @@
+# services/jobs.py
+import os, time, uuid, asyncio, contextvars
+from dotenv import load_dotenv
+from services.resilience import deadline_scope
+
+load_dotenv()
+# Background itinerary jobs: concurrent workers, queued jobs beyond which
+# submissions are rejected, seconds a finished job is kept, per-job time limit
+JOB_WORKERS = int(os.getenv("ITINERARY_JOB_WORKERS", "4"))
+JOB_MAX_QUEUED = int(os.getenv("ITINERARY_JOB_MAX_QUEUED", "32"))
+JOB_RESULT_TTL = float(os.getenv("ITINERARY_JOB_RESULT_TTL", "900"))
+JOB_TIMEOUT = float(os.getenv("ITINERARY_JOB_TIMEOUT", "300"))
+
+# name -> queue, so stats can be reported in one place
+_registry = {}
+
+
+class JobQueueFull(Exception):
+    """Raised when a submission would exceed the queue bound."""
+
+
+class JobQueue:
+    """
+    Bounded asyncio job queue with a fixed number of workers.
+    Jobs are dicts the handler may update while it runs (e.g. partial results);
+    finished jobs are kept for `ttl` seconds. A submission whose key matches a
+    queued, running or finished job returns that job instead of queuing a new one
+    (failed jobs are not reused, so a retry runs again).
+    """
+
+    def __init__(self, name: str, handler, workers: int = JOB_WORKERS,
+                 max_queued: int = JOB_MAX_QUEUED, ttl: float = JOB_RESULT_TTL, timeout: float = JOB_TIMEOUT):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.timeout = timeout
+        self.rejected = 0
+        self.deduplicated = 0
+        self._jobs = {}    # job_id -> job
+        self._by_key = {}  # request key -> job_id
+        self._queue = None
+        self._tasks = []
+        _registry[name] = self
+
+    def _purge(self):
+        cutoff = time.time() - self.ttl
+        expired = [jid for jid, job in self._jobs.items()
+                   if job["finished_at"] is not None and job["finished_at"] < cutoff]
+        for jid in expired:
+            job = self._jobs.pop(jid)
+            if self._by_key.get(job["key"]) == jid:
+                del self._by_key[job["key"]]
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [t for t in self._tasks if not t.done()]
+        while len(self._tasks) < self.workers:
+            # Workers start from an empty context, not the submitting request's
+            # (its deadline, memo and timings must not leak into later jobs)
+            self._tasks.append(contextvars.Context().run(asyncio.ensure_future, self._worker()))
+
+    def submit(self, key: str, *args):
+        """Queue a job (or return the matching existing one); returns (job, created)."""
+        self._purge()
+        existing = self._jobs.get(self._by_key.get(key))
+        if existing is not None and existing["status"] != "error":
+            self.deduplicated += 1
+            return existing, False
+
+        self._ensure_workers()
+        if self._queue.full():
+            self.rejected += 1
+            raise JobQueueFull(f"{self.name}: {self.max_queued} jobs already queued")
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "key": key,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        self._jobs[job["job_id"]] = job
+        self._by_key[key] = job["job_id"]
+        self._queue.put_nowait((job, args))
+        return job, True
+
+    def get(self, job_id: str):
+        self._purge()
+        return self._jobs.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job, args = await self._queue.get()
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            try:
+                with deadline_scope(self.timeout):
+                    job["result"] = await asyncio.wait_for(self.handler(job, *args), self.timeout)
+                job["status"] = "done"
+            except asyncio.TimeoutError:
+                job.update(status="error", error=f"timed out after {self.timeout:.0f}s")
+            except Exception as e:
+                job.update(status="error", error=str(e))
+            finally:
+                job["finished_at"] = time.time()
+                self._queue.task_done()
+
+    async def stop(self):
+        """Cancel the workers (called on app shutdown)."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self):
+        counts = {}
+        for job in self._jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "jobs": counts,
+            "rejected": self.rejected,
+            "deduplicated": self.deduplicated,
+        }
+
+
+def get_job_stats():
+    return {name: queue.stats() for name, queue in _registry.items()}
@@ -0,0 +1,263 @@
+# services/keywords.py
+"""
+Keyword extraction for review text: sparse TF-IDF over unigrams and bigrams.
+
+The vocabulary and IDF table are learned offline from a review corpus and loaded
+once; nothing is fitted on the request path. Without a vocabulary file, terms are
+hashed into a fixed feature space instead (no IDF, so only stop words filter out
+generic terms).
+
+    python -m services.keywords reviews.txt ResponseSamples/*.json     # build from files
+    python -m services.keywords --from-store                           # reviews in the POI store
+"""
+import os, sys, json, math, glob, argparse, threading
+from collections import Counter
+import numpy as np
+from scipy import sparse
+from dotenv import load_dotenv
+
+load_dotenv()
+KEYWORDS_VOCAB_PATH = os.getenv("KEYWORDS_VOCAB_PATH", "keyword_vocab.json")
+KEYWORDS_HASH_FEATURES = int(os.getenv("KEYWORDS_HASH_FEATURES", str(2 ** 20)))
+
+NGRAM_RANGE = (1, 2)
+# Words letters only, at least two characters (drops prices, times and ratings)
+TOKEN_PATTERN = r"(?u)\b[^\W\d_][^\W\d_]+\b"
+
+# Words that are frequent in any review and say nothing about the place
+REVIEW_STOP_WORDS = {
+    "place", "places", "time", "times", "visit", "visited", "visiting", "went", "go", "going", "come",
+    "came", "got", "get", "really", "just", "definitely", "highly", "recommend", "recommended",
+    "great", "good", "nice", "amazing", "awesome", "best", "love", "loved", "like", "lot", "lots",
+    "experience", "day", "days", "way", "thing", "things", "bit", "overall", "worth", "did", "does",
+    "make", "makes", "made", "know", "want", "wanted", "said", "say", "sure", "pretty", "ve", "ll", "don",
+    "didn", "wasn", "isn", "st", "th",
+}
+
+
+def _stop_words():
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    return sorted(ENGLISH_STOP_WORDS | REVIEW_STOP_WORDS)
+
+
+def _analyzer():
+    """Tokenizer + stop words + n-grams, without fitting anything."""
+    from sklearn.feature_extraction.text import CountVectorizer
+    return CountVectorizer(
+        stop_words=_stop_words(), token_pattern=TOKEN_PATTERN, ngram_range=NGRAM_RANGE
+    ).build_analyzer()
+
+
+class KeywordEngine:
+    """
+    Scores terms per group of texts (one group = one place's reviews).
+    A term's weight is its sublinear frequency (1 + log tf) summed over the group's
+    texts, times its IDF, so a term many reviewers mention beats one review repeating it.
+    With `terms` it uses that fixed vocabulary; otherwise terms are hashed.
+    """
+
+    def __init__(self, terms=None, idf=None, n_features: int = KEYWORDS_HASH_FEATURES):
+        self._analyze = _analyzer()
+        if terms is not None:
+            self.mode = "vocabulary"
+            self.terms = list(terms)
+            self._index = {t: i for i, t in enumerate(self.terms)}
+            self.n_features = len(self.terms)
+            self.idf = np.asarray(idf if idf is not None else np.ones(self.n_features), dtype=np.float32)
+        else:
+            from sklearn.utils import murmurhash3_32
+            self.mode = "hashing"
+            self.terms = None
+            self._hash = murmurhash3_32
+            self.n_features = n_features
+            self.idf = None
+
+    @classmethod
+    def load(cls, path: str = KEYWORDS_VOCAB_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["terms"], data["idf"])
+
+    # ----------- Vectorizing -----------
+    def _columns(self, text: str, names: dict):
+        """{feature column: occurrences} for `text`; records column -> term in `names`."""
+        cols = Counter()
+        for term in self._analyze(text):
+            if self.terms is not None:
+                col = self._index.get(term)
+                if col is None:
+                    continue
+            else:
+                col = self._hash(term, positive=True) % self.n_features
+                names.setdefault(col, term)
+            cols[col] += 1
+        return cols
+
+    def _group_matrix(self, groups):
+        """(groups x features) sparse matrix of summed sublinear term frequencies, times IDF."""
+        rows, cols, data, names = [], [], [], {}
+        for g, texts in enumerate(groups):
+            for text in texts:
+                for col, count in self._columns(text, names).items():
+                    rows.append(g)
+                    cols.append(col)
+                    data.append(1 + math.log(count))
+        data = np.asarray(data, dtype=np.float32)
+        # Duplicate (group, column) entries are summed on conversion to CSR
+        matrix = sparse.csr_matrix((data, (rows, cols)), shape=(len(groups), self.n_features))
+        if self.idf is not None:
+            matrix = matrix @ sparse.diags(self.idf)
+        return matrix.tocsr(), names
+
+    # ----------- Scoring -----------
+    def _name(self, col, names):
+        return self.terms[col] if self.terms is not None else names[col]
+
+    def _top_terms(self, cols, weights, names, k: int):
+        """
+        Best k terms by weight (unigrams first on ties). A bigram replaces the
+        unigrams it contains, and a unigram inside a chosen bigram is skipped.
+        """
+        terms = [self._name(c, names) for c in cols]
+        n_words = np.array([t.count(" ") + 1 for t in terms])
+        chosen = []
+        for i in np.lexsort((cols, n_words, -weights)):
+            term = terms[i]
+            words = term.split()
+            if len(words) == 1 and any(term in c.split() for c in chosen if " " in c):
+                continue
+            if len(words) > 1:
+                chosen = [c for c in chosen if c not in words]
+            chosen.append(term)
+            if len(chosen) >= k:
+                break
+        return chosen
+
+    def top_keywords_many(self, groups, k: int = 5):
+        """Top k keywords for every group of texts, scored in one sparse pass."""
+        if not groups:
+            return []
+        matrix, names = self._group_matrix(groups)
+        out = []
+        for g in range(matrix.shape[0]):
+            start, end = matrix.indptr[g], matrix.indptr[g + 1]
+            out.append(self._top_terms(matrix.indices[start:end], matrix.data[start:end], names, k))
+        return out
+
+    def top_keywords(self, texts, k: int = 5):
+        return self.top_keywords_many([texts], k)[0]
+
+
+# ----------- Building the vocabulary -----------
+def build_vocabulary(texts, min_df: int = 3, max_df: float = 0.5, max_features: int = 50000):
+    """
+    Vocabulary and smoothed IDF from a corpus (one text per review).
+    Terms in fewer than min_df reviews (typos, names) or more than max_df of them are dropped.
+    """
+    analyze = _analyzer()
+    df, n_docs = Counter(), 0
+    for text in texts:
+        df.update(set(analyze(text)))
+        n_docs += 1
+    if not n_docs:
+        raise ValueError("empty corpus")
+
+    limit = max_df * n_docs
+    kept = [(t, c) for t, c in df.items() if min_df <= c <= limit]
+    kept.sort(key=lambda tc: (-tc[1], tc[0]))
+    kept = sorted(kept[:max_features])
+    return {
+        "documents": n_docs,
+        "ngram_range": list(NGRAM_RANGE),
+        "terms": [t for t, _ in kept],
+        "idf": [round(math.log((1 + n_docs) / (1 + c)) + 1, 4) for _, c in kept],
+    }
+
+
+def save_vocabulary(vocab: dict, path: str = KEYWORDS_VOCAB_PATH):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(vocab, f)
+    os.replace(tmp, path)
+
+
+def _texts_from_json(data):
+    """Every "text" string in a JSON document (reviews, sentiment samples)."""
+    if isinstance(data, dict):
+        if isinstance(data.get("text"), str):
+            yield data["text"]
+        for value in data.values():
+            yield from _texts_from_json(value)
+    elif isinstance(data, list):
+        for value in data:
+            yield from _texts_from_json(value)
+
+
+def iter_corpus(paths):
+    """Review texts from .txt (one per line), .json and .jsonl files."""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            if path.endswith(".jsonl"):
+                for line in f:
+                    if line.strip():
+                        yield from _texts_from_json(json.loads(line))
+            elif path.endswith(".json"):
+                yield from _texts_from_json(json.load(f))
+            else:
+                yield from (line.strip() for line in f if line.strip())
+
+
+def iter_store_reviews(store):
+    for result in store.iter_details():
+        for review in result.get("reviews") or []:
+            if review.get("text"):
+                yield review["text"]
+
+
+# ----------- Shared engine -----------
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The shared engine: the vocabulary file when present, hashing otherwise."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if os.path.exists(KEYWORDS_VOCAB_PATH):
+                    _engine = KeywordEngine.load(KEYWORDS_VOCAB_PATH)
+                else:
+                    _engine = KeywordEngine()
+    return _engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the keyword vocabulary / IDF table from reviews.")
+    parser.add_argument("paths", nargs="*", help="Corpus files: .txt (one review per line), .json, .jsonl")
+    parser.add_argument("--from-store", action="store_true", help="Also use reviews held in the POI store")
+    parser.add_argument("--min-df", type=int, default=3)
+    parser.add_argument("--max-df", type=float, default=0.5)
+    parser.add_argument("--max-features", type=int, default=50000)
+    parser.add_argument("-o", "--output", default=KEYWORDS_VOCAB_PATH)
+    args = parser.parse_args()
+
+    paths = [p for pattern in args.paths for p in (glob.glob(pattern) or [pattern])]
+    if not paths and not args.from_store:
+        parser.error("give at least one corpus file or --from-store")
+
+    texts = list(iter_corpus(paths))
+    if args.from_store:
+        from services.poi_store import get_store
+        store = get_store()
+        if store is None:
+            parser.error("the POI store is disabled (POI_STORE_ENABLED)")
+        texts.extend(iter_store_reviews(store))
+
+    vocab = build_vocabulary(dict.fromkeys(texts), args.min_df, args.max_df, args.max_features)
+    save_vocabulary(vocab, args.output)
+    print(f"{len(vocab['terms'])} terms from {vocab['documents']} reviews -> {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
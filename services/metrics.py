@@ -0,0 +1,263 @@
+# services/metrics.py
+"""
+In-process timing and counters, rendered as Prometheus text at /metrics.
+
+    with timed("places.search"):
+        ...
+
+    @timed("sentiment.keywords")
+    def extract_keywords(...): ...
+
+Each timed stage feeds a latency histogram; inside timings_scope() the
+durations are also collected per request for the Server-Timing header.
+"""
+import os, time, asyncio, functools, threading, contextvars
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+# Add a Server-Timing header (per-stage durations) to every response
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "false").lower() == "true"
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HELP = {
+    "stage_duration_seconds": "Duration of instrumented service stages",
+    "stage_errors_total": "Instrumented stages that raised",
+    "http_request_duration_seconds": "Duration of API requests by route",
+    "http_requests_total": "API requests by route and status",
+    "llm_tokens_total": "Gemini tokens reported in usage metadata",
+    "llm_calls_total": "Gemini calls that reached the API (cache misses)",
+    "upstream_requests_total": "Outbound Google API requests by endpoint and outcome",
+    "cache_lookups_total": "Response cache lookups by cache and result",
+    "cache_entries": "Entries currently held per cache",
+    "singleflight_calls_total": "Single-flight calls and calls that shared another's result",
+    "jobs": "Background jobs held per queue, by status",
+    "jobs_rejected_total": "Job submissions rejected because the queue was full",
+    "circuit_breaker_state": "Upstream circuit breaker state (0 closed, 1 half open, 2 open)",
+    "circuit_breaker_opens_total": "Times an upstream circuit breaker opened",
+    "circuit_breaker_rejected_total": "Calls refused while an upstream circuit breaker was open",
+    "upstream_fallbacks_total": "Degraded answers served instead of an upstream result, by kind",
+    "hedged_requests_total": "Hedged duplicate requests sent, and how many answered first",
+    "deadline_exceeded_total": "Upstream calls skipped because the request deadline had passed",
+    "sentiment_reviews_total": "Distinct reviews scored, by source (per-review cache or model)",
+    "poi_refresh_total": "POI store search refreshes, stored or failed (previous row kept), by first-page status",
+    "sentiment_aggregates_total": "Per-place sentiment aggregates, by how they were produced",
+}
+
+_lock = threading.Lock()
+_histograms = {}  # (metric, labels) -> [bucket counts..., sum, count]
+_counters = {}    # (metric, labels) -> value
+
+# Per-request stage timings: list of (stage, seconds), set by timings_scope()
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _labels(labels: dict):
+    return tuple(sorted(labels.items()))
+
+
+def observe(metric: str, seconds: float, **labels):
+    key = (metric, _labels(labels))
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h[i] += 1
+                break
+        h[-2] += seconds
+        h[-1] += 1
+
+
+def inc(metric: str, value: float = 1, **labels):
+    key = (metric, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+class _Timer:
+    __slots__ = ("stage", "_start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        observe("stage_duration_seconds", elapsed, stage=self.stage)
+        if exc_type is not None:
+            inc("stage_errors_total", stage=self.stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((self.stage, elapsed))
+        return False
+
+    def __call__(self, fn):
+        stage = self.stage
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _Timer(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def timed(stage: str):
+    """Time a block (`with timed(...)`) or a sync/async function (`@timed(...)`)."""
+    return _Timer(stage)
+
+
+# ----------- Per-request timings -----------
+@contextmanager
+def timings_scope():
+    """Collect the stage timings of one request (shared with worker threads via copy_context)."""
+    timings = []
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def route_label(scope: dict):
+    """
+    Template of the matched route (e.g. /sentiment/{place_id}), bounded in cardinality.
+    Routes of an included router may carry their path without the router's prefix,
+    so the static prefix is taken from the request path in front of the part the
+    route's own pattern matches.
+    """
+    route = scope.get("route")
+    template, regex = getattr(route, "path", None), getattr(route, "path_regex", None)
+    if template is None:
+        return "unmatched"
+    path = scope.get("path", "")
+    if regex is not None:
+        for i, ch in enumerate(path):
+            if ch == "/" and regex.match(path[i:]):
+                return path[:i] + template
+    return template
+
+
+def server_timing_header(timings: list, total: float = None):
+    """Server-Timing value; repeated stages are summed (e.g. concurrent photo lookups)."""
+    totals, counts = {}, {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+        counts[stage] = counts.get(stage, 0) + 1
+    parts = [
+        f'{stage};dur={seconds * 1000:.1f}' + (f';desc="x{counts[stage]}"' if counts[stage] > 1 else "")
+        for stage, seconds in totals.items()
+    ]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+# ----------- LLM usage -----------
+def record_llm_usage(response, model: str):
+    """Count a Gemini call and its token usage (when the SDK reports it)."""
+    inc("llm_calls_total", model=model)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, attr in (("prompt", "prompt_token_count"), ("output", "candidates_token_count")):
+        count = getattr(usage, attr, None)
+        if count:
+            inc("llm_tokens_total", count, model=model, kind=kind)
+
+
+# ----------- Prometheus text -----------
+def _fmt_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def _collect_external():
+    """Counters owned by other modules, read at scrape time."""
+    from services.http_client import get_stats
+    from services.cache import get_cache_stats
+    from services.singleflight import get_flight_stats
+    from services.jobs import get_job_stats
+    from services.resilience import get_resilience_stats
+
+    counters, gauges = [], []
+    for endpoint, c in get_stats().items():
+        for outcome in ("calls", "retries", "errors"):
+            labels = (("endpoint", endpoint), ("outcome", outcome))
+            counters.append(("upstream_requests_total", labels, c[outcome]))
+    for name, s in get_cache_stats().items():
+        counters.append(("cache_lookups_total", (("cache", name), ("result", "hit")), s["hits"]))
+        counters.append(("cache_lookups_total", (("cache", name), ("result", "miss")), s["misses"]))
+        gauges.append(("cache_entries", (("cache", name),), s["size"]))
+    for name, s in get_flight_stats().items():
+        led = s["calls"] - s["shared"]
+        counters.append(("singleflight_calls_total", (("flight", name), ("result", "led")), led))
+        counters.append(("singleflight_calls_total", (("flight", name), ("result", "shared")), s["shared"]))
+    for name, s in get_job_stats().items():
+        for status, count in s["jobs"].items():
+            gauges.append(("jobs", (("queue", name), ("status", status)), count))
+        counters.append(("jobs_rejected_total", (("queue", name),), s["rejected"]))
+    resilience = get_resilience_stats()
+    for name, b in resilience["breakers"].items():
+        state = {"closed": 0, "half_open": 1, "open": 2}[b["state"]]
+        gauges.append(("circuit_breaker_state", (("upstream", name),), state))
+        counters.append(("circuit_breaker_opens_total", (("upstream", name),), b["opens"]))
+        counters.append(("circuit_breaker_rejected_total", (("upstream", name),), b["rejected"]))
+    for key, count in resilience["fallbacks"].items():
+        upstream, kind = key.split(":")
+        counters.append(("upstream_fallbacks_total", (("fallback", kind), ("upstream", upstream)), count))
+    for key, count in resilience["hedges"].items():
+        upstream, result = key.split(":")
+        counters.append(("hedged_requests_total", (("result", result), ("upstream", upstream)), count))
+    for what, count in resilience["deadline_exceeded"].items():
+        counters.append(("deadline_exceeded_total", (("upstream", what),), count))
+    return counters, gauges
+
+
+def render_prometheus(extra_gauges: list = None):
+    """All metrics in the Prometheus text exposition format (0.0.4)."""
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters = [(m, labels, v) for (m, labels), v in _counters.items()]
+    ext_counters, gauges = _collect_external()
+    counters += ext_counters
+    gauges += extra_gauges or []
+
+    lines = []
+    typed = set()
+
+    def header(metric, kind):
+        if metric not in typed:
+            typed.add(metric)
+            lines.append(f"# HELP {metric} {HELP.get(metric, metric)}")
+            lines.append(f"# TYPE {metric} {kind}")
+
+    for (metric, labels), h in sorted(histograms.items()):
+        header(metric, "histogram")
+        cumulative = 0
+        for bound, count in zip(BUCKETS, h):
+            cumulative += count
+            lines.append(f"{metric}_bucket{_fmt_labels(labels + (('le', str(bound)),))} {cumulative}")
+        lines.append(f"{metric}_bucket{_fmt_labels(labels + (('le', '+Inf'),))} {h[-1]}")
+        lines.append(f"{metric}_sum{_fmt_labels(labels)} {h[-2]:.6f}")
+        lines.append(f"{metric}_count{_fmt_labels(labels)} {h[-1]}")
+    for metric, labels, value in sorted(counters):
+        header(metric, "counter")
+        lines.append(f"{metric}{_fmt_labels(labels)} {value}")
+    for metric, labels, value in sorted(gauges):
+        header(metric, "gauge")
+        lines.append(f"{metric}{_fmt_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,164 @@
+# services/payloads.py
+"""
+Response shaping for the JSON endpoints:
+
+- projection: `view=compact` keeps what a client renders, `fields=` picks dotted paths
+- encoding: orjson, compressed with brotli or gzip when the client accepts it
+"""
+import os, gzip
+import orjson
+from fastapi import Query, Request
+from fastapi.responses import Response
+from dotenv import load_dotenv
+
+load_dotenv()
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+try:
+    import brotli  # optional: `pip install brotli` enables Content-Encoding: br
+except ImportError:
+    brotli = None
+
+# Place keys kept in compact itinerary / sentiment views
+COMPACT_PLACE_KEYS = ("place_id", "name", "lat", "lon", "rating", "price_level")
+COMPACT_SAMPLE_CHARS = 160
+
+
+# ----------- Projection -----------
+def _compact_place(place: dict):
+    out = {k: place.get(k) for k in COMPACT_PLACE_KEYS if k in place}
+    # One photo is enough for a card; the rest stay available in the full view
+    out["photo_urls"] = place.get("photo_urls", [])[:1]
+    return out
+
+
+def _compact_sample(sample: dict):
+    text = sample.get("text", "")
+    if len(text) > COMPACT_SAMPLE_CHARS:
+        text = text[:COMPACT_SAMPLE_CHARS].rsplit(" ", 1)[0] + "…"
+    return {**sample, "text": text}
+
+
+def compact_itinerary(payload: dict):
+    """Itinerary response with slim places (no types/address, a single photo)."""
+    out = dict(payload)
+    if payload.get("plan_struct") is not None:
+        out["plan_struct"] = [
+            {**day,
+             "attractions": [_compact_place(p) for p in day["attractions"]],
+             "restaurants": [_compact_place(p) for p in day["restaurants"]]}
+            for day in payload["plan_struct"]
+        ]
+    return out
+
+
+def compact_sentiment(payload: dict):
+    """Sentiment insights with sample reviews shortened."""
+    if not payload.get("samples"):
+        return payload
+    return {**payload, "samples": [_compact_sample(s) for s in payload["samples"]]}
+
+
+def _path_tree(fields: str):
+    """Parse "a,b.c,b.d" into {"a": {}, "b": {"c": {}, "d": {}}}."""
+    tree = {}
+    for path in fields.split(","):
+        node = tree
+        for part in filter(None, path.strip().split(".")):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _select(value, tree: dict):
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [_select(v, tree) for v in value]
+    if isinstance(value, dict):
+        return {k: _select(value[k], sub) for k, sub in tree.items() if k in value}
+    return value
+
+
+def select_fields(payload, fields: str):
+    """
+    Keep only the given comma-separated dotted paths; a path through a list applies
+    to every element, e.g. "itinerary_text,plan_struct.day,plan_struct.attractions.name".
+    """
+    tree = _path_tree(fields) if fields else {}
+    return _select(payload, tree) if tree else payload
+
+
+def project(payload, compact=None, view: str = "full", fields: str = None):
+    """Apply the compact view (via the `compact` function for this payload kind), then `fields`."""
+    if view == "compact" and compact is not None:
+        payload = compact(payload)
+    return select_fields(payload, fields)
+
+
+class Shape:
+    """`view` / `fields` query options plus the client's Accept-Encoding; use as a FastAPI dependency."""
+
+    def __init__(self, request: Request,
+                 view: str = Query("full", pattern="^(full|compact)$",
+                                   description="compact: slim places (one photo) and shortened review samples"),
+                 fields: str = Query(None, description="Comma-separated dotted paths to keep, "
+                                                       "e.g. itinerary_text,plan_struct.attractions.name")):
+        self.view = view
+        self.fields = fields
+        self.accept_encoding = request.headers.get("accept-encoding")
+
+    def project(self, payload, compact=None):
+        return project(payload, compact, self.view, self.fields)
+
+    def respond(self, payload, compact=None, **kwargs):
+        return json_response(self.project(payload, compact), self.accept_encoding, **kwargs)
+
+
+# ----------- Encoding -----------
+def dumps(payload):
+    """orjson bytes (non-str dict keys allowed, numpy scalars serialized)."""
+    return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _accepts(accept_encoding: str, coding: str):
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if name == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def negotiate(accept_encoding: str):
+    """Best supported Content-Encoding the client accepts ("br", "gzip" or None)."""
+    accept_encoding = accept_encoding or ""
+    if brotli is not None and _accepts(accept_encoding, "br"):
+        return "br"
+    if _accepts(accept_encoding, "gzip"):
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, coding: str):
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if coding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+def json_response(payload, accept_encoding: str = None, status_code: int = 200, headers: dict = None):
+    """
+    orjson-encoded response, compressed for bodies of at least COMPRESS_MIN_BYTES.
+    Returning a Response directly also skips FastAPI's response_model re-validation.
+    """
+    body = dumps(payload)
+    headers = dict(headers or {})
+    headers["Vary"] = "Accept-Encoding"
+    coding = negotiate(accept_encoding) if len(body) >= COMPRESS_MIN_BYTES else None
+    if coding:
+        body = compress(body, coding)
+        headers["Content-Encoding"] = coding
+    return Response(body, status_code=status_code, headers=headers, media_type="application/json")
@@ -0,0 +1,184 @@
+# services/photo_cache.py
+import os, asyncio, hashlib, threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from services.http_client import aget_bytes, MAPS_BASE_URL
+from services.singleflight import AsyncSingleFlight
+
+load_dotenv()
+PLACES_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
+PHOTO_BASE_URL = f"{MAPS_BASE_URL}/maps/api/place/photo"
+
+# Clients get /photos/{photo_reference} URLs; set PUBLIC_BASE_URL when the API
+# is not served from the same origin as the frontend (e.g. http://localhost:8000)
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "").rstrip("/")
+
+# On-disk LRU cache of photo bytes, bounded by total size
+PHOTO_CACHE_DIR = os.getenv("PHOTO_CACHE_DIR", "photo_cache")
+PHOTO_CACHE_MAX_BYTES = int(os.getenv("PHOTO_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Browser/CDN cache lifetime for served photos (seconds)
+PHOTO_MAX_AGE = int(os.getenv("PHOTO_MAX_AGE", "86400"))
+
+# Width variants; requests are snapped to the smallest variant at least as wide
+PHOTO_WIDTHS = (400, 800, 1600)
+DEFAULT_WIDTH = 800
+
+EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/gif": ".gif"}
+MEDIA_TYPES = {ext: media for media, ext in EXTENSIONS.items()}
+
+
+def photo_url(photo_reference: str, width: int = DEFAULT_WIDTH):
+    """Proxy URL handed to clients (no API key)."""
+    return f"{PUBLIC_BASE_URL}/photos/{photo_reference}?w={width}"
+
+
+def snap_width(width: int = None):
+    if not width:
+        return DEFAULT_WIDTH
+    return next((w for w in PHOTO_WIDTHS if w >= width), PHOTO_WIDTHS[-1])
+
+
+class PhotoCache:
+    """
+    Size-bounded LRU of image files in one directory.
+    The index (key -> path, size) lives in memory and is rebuilt from the
+    directory on start, oldest-modified first; a hit refreshes the file mtime.
+    """
+
+    def __init__(self, directory: str = PHOTO_CACHE_DIR, max_bytes: int = PHOTO_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        files = []
+        for name in os.listdir(self.directory):
+            stem, ext = os.path.splitext(name)
+            if ext not in MEDIA_TYPES:
+                continue
+            st = os.stat(os.path.join(self.directory, name))
+            files.append((st.st_mtime, stem, name, st.st_size))
+        for _, stem, name, size in sorted(files):
+            self._entries[stem] = (os.path.join(self.directory, name), size)
+            self._bytes += size
+        self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, (path, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get(self, key: str):
+        """Path of the cached file, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not os.path.exists(entry[0]):
+                if entry is not None:
+                    self._bytes -= entry[1]
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(entry[0])
+        except OSError:
+            pass
+        return entry[0]
+
+    def put(self, key: str, content: bytes, content_type: str):
+        """Write the bytes atomically and return the file path."""
+        ext = EXTENSIONS.get(content_type.split(";")[0].strip(), ".jpg")
+        path = os.path.join(self.directory, key + ext)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, path)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (path, len(content))
+            self._bytes += len(content)
+            self._evict()
+        return path
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": "disk",
+            "size": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# Concurrent requests for the same uncached photo share one download
+photo_flight = AsyncSingleFlight("photos")
+
+
+def get_photo_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PhotoCache()
+    return _cache
+
+
+def photo_key(photo_reference: str, width: int):
+    return f"{hashlib.sha256(photo_reference.encode()).hexdigest()[:32]}_w{width}"
+
+
+def etag_for(key: str):
+    # Photo references are immutable, so the cache key identifies the bytes
+    return f'"{key}"'
+
+
+def etag_matches(if_none_match: str, etag: str):
+    """Whether an If-None-Match header (one tag, a list, or *) matches `etag`."""
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def media_type_for(path: str):
+    return MEDIA_TYPES.get(os.path.splitext(path)[1], "image/jpeg")
+
+
+async def _download(photo_reference: str, width: int, key: str):
+    content, content_type = await aget_bytes(
+        PHOTO_BASE_URL,
+        {"maxwidth": width, "photo_reference": photo_reference, "key": PLACES_KEY},
+        endpoint="photo"
+    )
+    return await asyncio.to_thread(get_photo_cache().put, key, content, content_type)
+
+
+async def get_photo(photo_reference: str, width: int):
+    """
+    Path of the cached image for (reference, width), downloading it on a miss.
+    Disk lookups and writes run in a worker thread, off the event loop.
+    """
+    key = photo_key(photo_reference, width)
+    path = await asyncio.to_thread(lambda: get_photo_cache().get(key))
+    if path is not None:
+        return key, path
+    return key, await photo_flight.do(key, _download, photo_reference, width, key)
@@ -0,0 +1,113 @@
+# services/place_details.py
+import os, contextvars
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from services.http_client import get_json, aget_json, MAPS_BASE_URL
+from services.cache import make_cache, MISS
+from services.poi_store import get_store, off_loop
+from services.resilience import PLACES_HEDGE_DELAY
+
+load_dotenv()
+PLACES_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
+DETAILS_URL = f"{MAPS_BASE_URL}/maps/api/place/details/json"
+
+DETAILS_TTL = float(os.getenv("PLACES_DETAILS_TTL", "86400"))
+CACHE_MAXSIZE = int(os.getenv("PLACES_CACHE_MAXSIZE", "2048"))
+
+# place_id -> {"fields": [...], "result": {...}}, shared across requests
+details_cache = make_cache("places_details", maxsize=CACHE_MAXSIZE, ttl=DETAILS_TTL)
+
+# place_id -> same entry shape, scoped to one API request
+_request_memo = contextvars.ContextVar("place_details_memo", default=None)
+
+
+@contextmanager
+def details_scope():
+    """Memoize Place Details lookups for the duration of one request."""
+    token = _request_memo.set({})
+    try:
+        yield
+    finally:
+        _request_memo.reset(token)
+
+
+def _covers(entry, fields):
+    return entry is not None and set(fields) <= set(entry["fields"])
+
+
+def _lookup(place_id: str, fields):
+    """Return (memo, entry, missing_fields) from the request memo, shared cache or POI store."""
+    memo = _request_memo.get()
+    entry = memo.get(place_id) if memo is not None else None
+    if _covers(entry, fields):
+        return memo, entry, []
+
+    cached = details_cache.get(place_id)
+    if cached is not MISS:
+        entry = cached
+    if not _covers(entry, fields):
+        store = get_store()
+        stored = store.get_details(place_id) if store else None
+        if _covers(stored, fields):
+            details_cache.set(place_id, stored)
+            entry = stored
+    if _covers(entry, fields):
+        return memo, entry, []
+
+    known = set(entry["fields"]) if entry else set()
+    return memo, entry, sorted(set(fields) - known)
+
+
+def _store(memo, place_id: str, entry, missing, data):
+    """Merge newly fetched fields into the entry and record it in the memo/cache."""
+    if missing:
+        known = set(entry["fields"]) if entry else set()
+        result = dict(entry["result"]) if entry else {}
+        result.update(data.get("result", {}))
+        entry = {"fields": sorted(known | set(missing)), "result": result}
+        if data.get("status") == "OK":
+            details_cache.set(place_id, entry)
+            store = get_store()
+            if store:
+                store.put_details(place_id, entry)
+
+    if memo is not None:
+        memo[place_id] = entry
+    return entry["result"]
+
+
+def _params(place_id: str, missing):
+    return {"place_id": place_id, "fields": ",".join(missing), "key": PLACES_KEY}
+
+
+def get_place_details(place_id: str, fields=("photos", "reviews")):
+    """
+    Return the Place Details `result` dict containing at least `fields`.
+    Checks the request memo, then the shared cache; on a miss only the fields not
+    already known for this place are fetched and merged into the stored entry.
+    A call slower than PLACES_HEDGE_DELAY gets a duplicate request (first answer wins).
+    """
+    memo, entry, missing = _lookup(place_id, fields)
+    data = None
+    if missing:
+        data = get_json(DETAILS_URL, _params(place_id, missing), endpoint="details", hedge_after=PLACES_HEDGE_DELAY)
+    return _store(memo, place_id, entry, missing, data)
+
+
+async def get_place_details_async(place_id: str, fields=("photos", "reviews")):
+    """Async version of get_place_details; cache and POI store I/O stays off the event loop."""
+    memo, entry, missing = await off_loop(details_cache, _lookup, place_id, fields)
+    data = None
+    if missing:
+        data = await aget_json(
+            DETAILS_URL, _params(place_id, missing), endpoint="details", hedge_after=PLACES_HEDGE_DELAY
+        )
+        return await off_loop(details_cache, _store, memo, place_id, entry, missing, data)
+    return _store(memo, place_id, entry, missing, data)
+
+
+def get_stale_details(place_id: str, fields=("reviews",)):
+    """Last stored details result covering `fields`, however old (None if unknown); used as a fallback."""
+    store = get_store()
+    stored = store.get_details(place_id, max_age=float("inf")) if store else None
+    return stored["result"] if _covers(stored, fields) else None
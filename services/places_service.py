@@ -1,53 +1,331 @@
-import os, urllib.parse, requests, time
+import os, time, asyncio
 from dotenv import load_dotenv
+from services.http_client import get_json, aget_json, MAPS_BASE_URL
+from services.cache import make_cache, normalize_key, MISS
+from services.place_details import get_place_details_async
+from services.poi_store import get_store, off_loop
+from services.photo_cache import photo_url
+from services.metrics import timed
+from services.resilience import record_fallback, check_deadline, DeadlineExceeded
 
 # Load environment variables
 load_dotenv()
 PLACES_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
 
-# Google Places API endpoints
-TEXT_SEARCH_URL = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-DETAILS_URL = "https://maps.googleapis.com/maps/api/place/details/json"
-PHOTO_BASE_URL = "https://maps.googleapis.com/maps/api/place/photo"
+# Google Places API endpoint (photos are served through the /photos proxy)
+TEXT_SEARCH_URL = f"{MAPS_BASE_URL}/maps/api/place/textsearch/json"
 
+# How many places the itinerary planner uses per day
+ATTRACTIONS_PER_DAY = 4
+RESTAURANTS_PER_DAY = 2
 
-def _text_search(query: str):
-    """Perform a Google Places Text Search query."""
-    params = {"query": query, "key": PLACES_KEY}
-    resp = requests.get(TEXT_SEARCH_URL, params=params, timeout=30)
-    resp.raise_for_status()
-    data = resp.json()
-    return data.get("results", [])
+# Photo enrichment tuning (Place Details calls run concurrently under these limits)
+ENRICH_CONCURRENCY = int(os.getenv("PLACES_ENRICH_CONCURRENCY", "8"))
 
+# Response caches (TTL in seconds per endpoint)
+TEXT_SEARCH_TTL = float(os.getenv("PLACES_TEXTSEARCH_TTL", "21600"))
+CACHE_MAXSIZE = int(os.getenv("PLACES_CACHE_MAXSIZE", "2048"))
 
-def _get_place_photos(place_id: str, max_photos: int = 5):
+text_search_cache = make_cache("places_textsearch", maxsize=CACHE_MAXSIZE, ttl=TEXT_SEARCH_TTL)
+
+# Text Search pagination (Google returns up to 20 results per page and 3 pages per query)
+TEXT_SEARCH_MAX_PAGES = int(os.getenv("PLACES_TEXTSEARCH_MAX_PAGES", "3"))
+# A next_page_token is only accepted a couple of seconds after it is issued
+PAGE_TOKEN_DELAY = 2.0
+PAGE_TOKEN_RETRIES = 2
+
+# When the searches leave too few places passing the filters, stored places within this
+# radius (km) of what they did return fill the gap (only with the POI store enabled)
+NEARBY_FILL_RADIUS_KM = float(os.getenv("POI_NEARBY_RADIUS_KM", "10"))
+
+# A place returned by both searches is kept as a restaurant only if it has one of these types
+FOOD_TYPES = {"restaurant", "cafe", "bar", "bakery", "meal_takeaway", "meal_delivery"}
+
+
+def search_entry(results: list, next_page_token: str = None, pages: int = 1):
+    """Cached Text Search value: the results fetched so far and how to get the next page."""
+    return {
+        "results": results, "pages": pages,
+        "next_page_token": next_page_token, "token_at": time.time()
+    }
+
+
+def _cached_search(key: str):
+    """Entry from the in-process cache, then the persistent POI store (if enabled)."""
+    cached = text_search_cache.get(key)
+    if isinstance(cached, list):  # entries written before pagination
+        cached = search_entry(cached)
+    if cached is not MISS:
+        return cached
+    store = get_store()
+    stored = store.get_search(key) if store else None
+    if stored is not None:
+        entry = search_entry(stored)
+        text_search_cache.set(key, entry)
+        return entry
+    return MISS
+
+
+def _page_params(query: str, entry):
+    if entry is None:
+        return {"query": query, "key": PLACES_KEY}
+    return {"pagetoken": entry["next_page_token"], "key": PLACES_KEY}
+
+
+def _has_next_page(entry, max_pages: int):
+    return entry is None or (bool(entry["next_page_token"]) and entry["pages"] < max_pages)
+
+
+def _token_wait(entry):
+    """Seconds until the entry's next_page_token becomes usable (0 for a first page)."""
+    if entry is None:
+        return 0.0
+    return max(0.0, entry["token_at"] + PAGE_TOKEN_DELAY - time.time())
+
+
+def _token_pending(entry, data: dict):
+    # Google answers INVALID_REQUEST while a fresh page token is not active yet;
+    # for an old (cached) token the same status means it has expired
+    return (entry is not None and data.get("status") == "INVALID_REQUEST"
+            and time.time() - entry["token_at"] < PAGE_TOKEN_DELAY * (PAGE_TOKEN_RETRIES + 2))
+
+
+def _record_page(key: str, query: str, entry, data: dict, destination: str = None, use_cache: bool = True):
+    """Append one fetched page to the entry (and the caches); returns the new entry."""
+    ok = data.get("status") in ("OK", "ZERO_RESULTS")
+    results = (entry["results"] if entry else []) + (data.get("results", []) if ok else [])
+    new = search_entry(
+        results,
+        next_page_token=data.get("next_page_token") if ok else None,
+        pages=(entry["pages"] if entry else 0) + 1
+    )
+    # A failed first page is not cached; a failed later page (e.g. an expired token)
+    # ends pagination for the cached entry
+    if use_cache and (ok or entry is not None):
+        text_search_cache.set(key, new)
+        store = get_store()
+        if store:
+            store.put_search(key, query, results, destination=destination)
+    return new
+
+
+def _token_sleep(delay: float):
+    """`delay`, or DeadlineExceeded when waiting for a page token would outlast the request deadline."""
+    left = check_deadline("textsearch")
+    if delay and left is not None and delay >= left:
+        raise DeadlineExceeded("textsearch: no time left to wait for the next page token")
+    return delay
+
+
+def _search_fallback(key: str, entry, error: Exception):
+    """
+    Results to use when a Text Search call fails: for a first page, the stored
+    results however old (re-raises when there are none); for a later page,
+    nothing more (the pages already fetched stand).
+    """
+    if entry is not None:
+        record_fallback("places.textsearch", "partial")
+        return []
+    store = get_store()
+    stale = store.get_search(key, max_age=float("inf")) if store else None
+    if stale is None:
+        raise error
+    record_fallback("places.textsearch", "stale")
+    return stale
+
+
+def iter_text_search_pages(query: str, destination: str = None,
+                           max_pages: int = TEXT_SEARCH_MAX_PAGES, use_cache: bool = True):
     """
-    Fetch multiple photo URLs for a place using the Place Details API.
-    Returns a list of URLs (can be empty if no photos exist).
+    Lazily yield Text Search result pages (lists of raw results) for a query.
+    Cached pages come first, in one list; a further page is fetched only when the
+    consumer asks for it, so stopping early saves both the call and the token delay.
+    When Google fails (or the breaker is open) the stale stored results stand in.
+    """
+    key = normalize_key(query)
+    entry = _cached_search(key) if use_cache else MISS
+    if entry is MISS:
+        entry = None
+    else:
+        yield entry["results"]
+
+    while _has_next_page(entry, max_pages):
+        delay = _token_wait(entry)
+        try:
+            for _ in range(PAGE_TOKEN_RETRIES + 1):
+                time.sleep(_token_sleep(delay))
+                data = get_json(TEXT_SEARCH_URL, _page_params(query, entry), endpoint="textsearch")
+                if not _token_pending(entry, data):
+                    break
+                delay = PAGE_TOKEN_DELAY
+        except Exception as e:
+            yield _search_fallback(key, entry, e)
+            return
+        entry = _record_page(key, query, entry, data, destination, use_cache)
+        yield data.get("results", []) if data.get("status") == "OK" else []
+
+
+async def aiter_text_search_pages(query: str, destination: str = None,
+                                  max_pages: int = TEXT_SEARCH_MAX_PAGES, use_cache: bool = True):
+    """
+    Async version of iter_text_search_pages; the token delay and the cache / POI store
+    reads and writes do not block the event loop.
+    """
+    key = normalize_key(query)
+    entry = await off_loop(text_search_cache, _cached_search, key) if use_cache else MISS
+    if entry is MISS:
+        entry = None
+    else:
+        yield entry["results"]
+
+    while _has_next_page(entry, max_pages):
+        delay = _token_wait(entry)
+        try:
+            for _ in range(PAGE_TOKEN_RETRIES + 1):
+                await asyncio.sleep(_token_sleep(delay))
+                data = await aget_json(TEXT_SEARCH_URL, _page_params(query, entry), endpoint="textsearch")
+                if not _token_pending(entry, data):
+                    break
+                delay = PAGE_TOKEN_DELAY
+        except Exception as e:
+            yield await off_loop(text_search_cache, _search_fallback, key, entry, e)
+            return
+        entry = await off_loop(
+            text_search_cache, _record_page, key, query, entry, data, destination, use_cache
+        )
+        yield data.get("results", []) if data.get("status") == "OK" else []
+
+
+def _text_search(query: str, destination: str = None, max_pages: int = 1):
+    """Perform a Google Places Text Search query (cached by normalized query)."""
+    return [r for page in iter_text_search_pages(query, destination, max_pages) for r in page]
+
+
+# ----------- Candidate collection -----------
+def _passes(raw: dict, budget: int, kid_friendly: bool):
+    return bool(_filter_pois(_normalize([raw]), budget, kid_friendly=kid_friendly))
+
+
+def _add_page(page: list, raws: list, seen: set, accept):
+    """Append results not seen yet (by place_id); returns how many of them pass `accept`."""
+    passed = 0
+    for r in page:
+        pid = r.get("place_id")
+        if pid is not None:
+            if pid in seen:
+                continue
+            seen.add(pid)
+        raws.append(r)
+        passed += accept(r)
+    return passed
+
+
+async def _collect_async(pages, need: int, accept):
+    """Consume pages until `need` results pass `accept` (or the pages run out)."""
+    raws, seen, passed = [], set(), 0
+    async for page in pages:
+        passed += _add_page(page, raws, seen, accept)
+        if passed >= need:
+            break
+    await pages.aclose()
+    return raws
+
+
+def _centroid(raws: list):
+    points = [(loc["lat"], loc["lng"]) for r in raws
+              for loc in [r.get("geometry", {}).get("location", {})] if "lat" in loc and "lng" in loc]
+    if not points:
+        return None
+    return sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points)
+
+
+def _nearby_fill(raws: list, center, need: int, accept, budget: int,
+                 place_type: str = None, exclude_types=()):
+    """
+    Top up a short candidate list with stored places near `center` (best rated first,
+    through the store's grid index), until `need` of them pass `accept`.
+    """
+    store = get_store()
+    passed = sum(1 for r in raws if accept(r))
+    if store is None or center is None or passed >= need:
+        return raws
+    extra = store.nearby(
+        center[0], center[1], NEARBY_FILL_RADIUS_KM,
+        min_rating=3.5, max_price=budget, place_type=place_type, limit=4 * need
+    )
+    seen = {r.get("place_id") for r in raws if r.get("place_id")}
+    raws = list(raws)
+    added = 0
+    for r in extra:
+        if passed >= need:
+            break
+        if r.get("place_id") in seen or set(exclude_types) & set(r.get("types", [])) or not accept(r):
+            continue
+        seen.add(r.get("place_id"))
+        raws.append(r)
+        passed += 1
+        added += 1
+    if added:
+        record_fallback("places.textsearch", "nearby")
+    return raws
+
+
+def _dedupe_across(attractions_raw: list, restaurants_raw: list):
+    """A place returned by both searches goes to restaurants if it is food-typed, else to attractions."""
+    att_ids = {r.get("place_id") for r in attractions_raw if r.get("place_id")}
+    shared = {r["place_id"] for r in restaurants_raw if r.get("place_id") in att_ids}
+    food = {r["place_id"] for r in restaurants_raw
+            if r.get("place_id") in shared and FOOD_TYPES & set(r.get("types", []))}
+    atts = [r for r in attractions_raw if r.get("place_id") not in food]
+    rests = [r for r in restaurants_raw if r.get("place_id") not in shared - food]
+    return atts, rests
+
+
+def _photo_urls(result: dict, max_photos: int):
+    photos = result.get("photos", [])
+    photo_refs = [p.get("photo_reference") for p in photos[:max_photos] if p.get("photo_reference")]
+    return [photo_url(ref) for ref in photo_refs]
+
+
+async def _get_place_photos_async(place_id: str, max_photos: int = 5):
+    """
+    Photo URLs for a place from the Place Details API (empty when the lookup fails;
+    the place then keeps the photo it came with from Text Search).
     """
     try:
-        params = {
-            "place_id": place_id,
-            "fields": "photos",
-            "key": PLACES_KEY
-        }
-        resp = requests.get(DETAILS_URL, params=params, timeout=20)
-        resp.raise_for_status()
-        data = resp.json()
-        photos = data.get("result", {}).get("photos", [])
-        photo_refs = [p.get("photo_reference") for p in photos[:max_photos] if p.get("photo_reference")]
-
-        photo_urls = [
-            f"{PHOTO_BASE_URL}?maxwidth=800&photo_reference={ref}&key={PLACES_KEY}"
-            for ref in photo_refs
-        ]
-        return photo_urls
+        return _photo_urls(await get_place_details_async(place_id, fields=("photos",)), max_photos)
     except Exception:
+        record_fallback("places.details", "no_photos")
         return []
 
 
-def _normalize(results, enrich_photos: bool = True):
-    """Normalize raw Places API results with optional multi-photo enrichment."""
+def _merge_photos(place: dict, extra_photos: list):
+    # Avoid duplicates
+    for url in extra_photos:
+        if url not in place["photo_urls"]:
+            place["photo_urls"].append(url)
+
+
+@timed("places.photos")
+async def _enrich_photos_async(places: list, max_photos: int = 5):
+    """
+    Add Place Details photos to already-normalized places, in place. Lookups run
+    concurrently on the event loop (bounded by ENRICH_CONCURRENCY); a failed one
+    leaves that place with its existing photos.
+    """
+    targets = [p for p in places if p.get("place_id")]
+    semaphore = asyncio.Semaphore(max(1, ENRICH_CONCURRENCY))
+
+    async def enrich(place):
+        async with semaphore:
+            _merge_photos(place, await _get_place_photos_async(place["place_id"], max_photos))
+
+    await asyncio.gather(*(enrich(p) for p in targets), return_exceptions=True)
+    return places
+
+
+def _normalize(results):
+    """Normalize raw Places API results (the Text Search photo only; see _enrich_photos_async)."""
     out = []
     for r in results:
         # Default: use any photo provided by text search
@@ -56,19 +334,7 @@ def _normalize(results, enrich_photos: bool = True):
         if photos:
             ref = photos[0].get("photo_reference")
             if ref:
-                photo_urls.append(
-                    f"{PHOTO_BASE_URL}?maxwidth=800&photo_reference={ref}&key={PLACES_KEY}"
-                )
-
-        # Optionally fetch more photos using Place Details
-        if enrich_photos and r.get("place_id"):
-            extra_photos = _get_place_photos(r["place_id"], max_photos=5)
-            # Avoid duplicates
-            for url in extra_photos:
-                if url not in photo_urls:
-                    photo_urls.append(url)
-            # Small delay to avoid hitting quota too quickly
-            time.sleep(0.2)
+                photo_urls.append(photo_url(ref))
 
         out.append({
             "place_id": r.get("place_id"),  
@@ -86,18 +352,34 @@ def _normalize(results, enrich_photos: bool = True):
     return out
 
 
-def fetch_pois_for_destination(destination: str,
-                               max_results_per_type: int = 20,
-                               kid_friendly: bool = False,
-                               budget: int = 4,
-                               travel_type: str = None,
-                               activity_theme: str = None):
-    """
-    Fetch POIs (Places of Interest) for a destination.
-    Includes filters (kid_friendly, budget, travel_type, activity_theme)
-    and multiple photo URLs per place (via Place Details API).
-    """
+def _filter_pois(places: list, budget: int, kid_friendly: bool = False):
+    """Apply the kid-friendly, budget (0–4) and rating filters to normalized places."""
+    # --- Kid-friendly filter ---
+    if kid_friendly:
+        places = [
+            p for p in places
+            if "park" in ",".join(p["types"]) or "museum" in ",".join(p["types"])
+        ]
+
+    # --- Budget filter (0–4) ---
+    places = [
+        p for p in places
+        if p.get("price_level") is None or p["price_level"] <= budget
+    ]
+
+    # --- Rating threshold ---
+    return [p for p in places if (p.get("rating") or 0) >= 3.5]
 
+
+def _rank_pois(places: list):
+    """Sort places by rating, then popularity (highest first)."""
+    return sorted(
+        places, key=lambda x: (x.get("rating") or 0, x.get("user_ratings_total") or 0), reverse=True
+    )
+
+
+def _build_queries(destination: str, travel_type: str = None, activity_theme: str = None):
+    """Build the Text Search queries for attractions and restaurants."""
     # --- Build dynamic query for attractions ---
     query_parts = [f"top tourist attractions in {destination}"]
 
@@ -118,36 +400,93 @@ def fetch_pois_for_destination(destination: str,
 
     att_query = " ".join(query_parts)
     rest_query = f"best restaurants in {destination}"
+    return att_query, rest_query
 
-    # --- Fetch from Google Places API ---
-    attractions_raw = _text_search(att_query)
-    restaurants_raw = _text_search(rest_query)
 
-    # --- Normalize and enrich photo data ---
-    atts = _normalize(attractions_raw[:max_results_per_type], enrich_photos=True)
-    rests = _normalize(restaurants_raw[:max_results_per_type], enrich_photos=True)
+def _select_pois(attractions_raw, restaurants_raw, max_results_per_type, kid_friendly, budget, days):
+    """Normalize, filter, rank and trim raw search results (no Place Details calls)."""
+    # --- Normalize (cheap Text Search fields only) ---
+    atts = _normalize(attractions_raw)
+    rests = _normalize(restaurants_raw)
 
-    # --- Kid-friendly filter ---
-    if kid_friendly:
-        atts = [
-            a for a in atts
-            if "park" in ",".join(a["types"]) or "museum" in ",".join(a["types"])
-        ]
+    # --- Filter and rank before spending Place Details calls ---
+    atts = _rank_pois(_filter_pois(atts, budget, kid_friendly=kid_friendly))[:max_results_per_type]
+    rests = _rank_pois(_filter_pois(rests, budget))[:max_results_per_type]
 
-    # --- Budget filter (0–4) ---
-    atts = [
-        a for a in atts
-        if (a.get("price_level") is not None and a["price_level"] <= budget)
-        or a.get("price_level") is None
-    ]
-    rests = [
-        r for r in rests
-        if (r.get("price_level") is not None and r["price_level"] <= budget)
-        or r.get("price_level") is None
-    ]
+    if days is not None:
+        atts = atts[:days * ATTRACTIONS_PER_DAY]
+        rests = rests[:days * RESTAURANTS_PER_DAY]
 
-    # --- Rating threshold ---
-    atts = [a for a in atts if a.get("rating", 0) >= 3.5]
-    rests = [r for r in rests if r.get("rating", 0) >= 3.5]
+    return atts, rests
+
+
+def _needed(max_results_per_type: int, days: int = None):
+    """How many filtered (attractions, restaurants) are worth paging for."""
+    if days is None:
+        return max_results_per_type, max_results_per_type
+    return (min(max_results_per_type, days * ATTRACTIONS_PER_DAY),
+            min(max_results_per_type, days * RESTAURANTS_PER_DAY))
+
+
+async def fetch_pois_for_destination_async(destination: str,
+                                           max_results_per_type: int = 20,
+                                           kid_friendly: bool = False,
+                                           budget: int = 4,
+                                           travel_type: str = None,
+                                           activity_theme: str = None,
+                                           days: int = None,
+                                           enrich_photos: bool = True,
+                                           max_pages: int = TEXT_SEARCH_MAX_PAGES):
+    """
+    Fetch POIs (Places of Interest) for a destination.
+    Includes filters (kid_friendly, budget, travel_type, activity_theme)
+    and multiple photo URLs per place (via Place Details API).
+
+    Text Search pages are fetched (up to max_pages) only until enough places
+    pass the filters: `days` worth of itinerary slots, or max_results_per_type.
+    Places are deduplicated by place_id across both searches, and the two
+    searches run concurrently, as do all photo lookups. With the POI store
+    enabled, stored places near the results fill in when too few pass.
+
+    Filtering and ranking run on the Text Search fields first; when `days` is
+    given, only the places the itinerary will use are enriched with photos.
+    With enrich_photos=False the full ranked candidate lists (up to
+    max_results_per_type) are returned and the caller enriches what it picks.
+    """
+    att_query, rest_query = _build_queries(destination, travel_type, activity_theme)
+    att_need, rest_need = _needed(max_results_per_type, days)
+
+    # --- Fetch from Google Places API (both searches at once) ---
+    with timed("places.search"):
+        attractions_raw, restaurants_raw = await asyncio.gather(
+            _collect_async(
+                aiter_text_search_pages(att_query, destination, max_pages), att_need,
+                lambda r: _passes(r, budget, kid_friendly)
+            ),
+            _collect_async(
+                aiter_text_search_pages(rest_query, destination, max_pages), rest_need,
+                lambda r: _passes(r, budget, False)
+            )
+        )
+
+    # --- Short on candidates (sparse area, failed later pages): fill from the local store ---
+    if get_store() is not None:
+        center = _centroid(attractions_raw + restaurants_raw)
+        attractions_raw, restaurants_raw = await asyncio.gather(
+            off_loop(None, _nearby_fill, attractions_raw, center, att_need,
+                     lambda r: _passes(r, budget, kid_friendly), budget, None, FOOD_TYPES),
+            off_loop(None, _nearby_fill, restaurants_raw, center, rest_need,
+                     lambda r: _passes(r, budget, False), budget, "restaurant")
+        )
+    attractions_raw, restaurants_raw = _dedupe_across(attractions_raw, restaurants_raw)
+
+    atts, rests = _select_pois(
+        attractions_raw, restaurants_raw, max_results_per_type, kid_friendly, budget,
+        days if enrich_photos else None
+    )
+
+    # --- Enrich photo data for the places that will be shown ---
+    if enrich_photos:
+        await _enrich_photos_async(atts + rests, max_photos=5)
 
     return {"attractions": atts, "restaurants": rests}
@@ -0,0 +1,188 @@
+# services/planner.py
+import math
+import numpy as np
+
+KM_PER_DEG = 111.32
+EARTH_RADIUS_KM = 6371.0
+
+
+def _has_coords(place: dict):
+    return place.get("lat") is not None and place.get("lon") is not None
+
+
+def _project(places: list, ref_lat: float):
+    """Equirectangular projection to km around ref_lat (accurate enough at city scale)."""
+    lat = np.array([p["lat"] for p in places], dtype=float)
+    lon = np.array([p["lon"] for p in places], dtype=float)
+    cos0 = math.cos(math.radians(ref_lat))
+    return np.column_stack((lon * KM_PER_DEG * cos0, lat * KM_PER_DEG))
+
+
+def _distance_matrix(a: np.ndarray, b: np.ndarray):
+    return np.sqrt(((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2))
+
+
+def _haversine_km(p: dict, q: dict):
+    p1, p2 = math.radians(p["lat"]), math.radians(q["lat"])
+    dp, dl = p2 - p1, math.radians(q["lon"] - p["lon"])
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+# ----------- Clustering -----------
+def _balanced_assign(dist: np.ndarray, capacity: int):
+    """Greedy capacity-limited assignment: closest (point, cluster) pairs are taken first."""
+    n, k = dist.shape
+    if k == 1:
+        return np.zeros(n, dtype=int)
+    labels = np.full(n, -1)
+    room = [capacity] * k
+    assigned = 0
+    for flat in np.argsort(dist, axis=None).tolist():
+        i, c = divmod(flat, k)
+        if labels[i] == -1 and room[c] > 0:
+            labels[i] = c
+            room[c] -= 1
+            assigned += 1
+            if assigned == n:
+                break
+    return labels
+
+
+def cluster_days(xy: np.ndarray, k: int, capacity: int, iterations: int = 10):
+    """
+    Split points into k geographically compact groups of at most `capacity` each.
+    Deterministic: seeded with point 0 (the best ranked) and farthest-point picks.
+    """
+    n = len(xy)
+    k = max(1, min(k, n))
+    seeds = [0]
+    min_d = np.linalg.norm(xy - xy[0], axis=1)
+    for _ in range(1, k):
+        nxt = int(min_d.argmax())
+        seeds.append(nxt)
+        min_d = np.minimum(min_d, np.linalg.norm(xy - xy[nxt], axis=1))
+    centroids = xy[seeds].copy()
+
+    labels = None
+    for _ in range(iterations):
+        new_labels = _balanced_assign(_distance_matrix(xy, centroids), capacity)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = xy[labels == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+    return labels, centroids
+
+
+# ----------- Route ordering -----------
+def order_route(dist: np.ndarray):
+    """Open path through all points: nearest-neighbour start, then 2-opt improvement."""
+    n = len(dist)
+    if n <= 2:
+        return list(range(n))
+
+    # Start at an extreme point so the path sweeps across the group
+    start = int(dist.sum(axis=1).argmax())
+    order = [start]
+    visited = np.zeros(n, dtype=bool)
+    visited[start] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, dist[order[-1]])
+        nxt = int(row.argmin())
+        order.append(nxt)
+        visited[nxt] = True
+
+    order = np.array(order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n - 2):
+            a, b = order[i], order[i + 1]
+            js = np.arange(i + 2, n)
+            c = order[js]
+            # Reversing order[i+1..j]: replace edges (a,b) and (c,d) with (a,c) and (b,d)
+            d = np.append(order[js[:-1] + 1], -1)
+            old = dist[a, b] + np.where(d >= 0, dist[c, d], 0.0)
+            new = dist[a, c] + np.where(d >= 0, dist[b, d], 0.0)
+            gain = old - new
+            best = int(gain.argmax())
+            if gain[best] > 1e-9:
+                j = js[best]
+                order[i + 1:j + 1] = order[i + 1:j + 1][::-1]
+                improved = True
+    return order.tolist()
+
+
+def route_distance_km(stops: list):
+    """Total great-circle length of a day's ordered stops."""
+    located = [p for p in stops if _has_coords(p)]
+    return round(sum(_haversine_km(located[i], located[i + 1]) for i in range(len(located) - 1)), 2)
+
+
+# ----------- Day planning -----------
+def plan_days(attractions: list, restaurants: list, days: int,
+              attractions_per_day: int = 4, restaurants_per_day: int = 2):
+    """
+    Build plan_struct: the top days*attractions_per_day attractions are split into
+    geographically compact days, each day's stops are ordered to minimize travel,
+    and each day gets the nearest unused restaurants. Places without coordinates
+    fill remaining slots in rank order. No days (days <= 0) gives an empty plan.
+    """
+    if days <= 0:
+        return []
+    chosen = attractions[:days * attractions_per_day]
+    located = [p for p in chosen if _has_coords(p)]
+    unlocated = [p for p in chosen if not _has_coords(p)]
+    day_atts = [[] for _ in range(days)]
+    centroids = [None] * days
+
+    ref_lat = float(np.mean([p["lat"] for p in located])) if located else 0.0
+    if located:
+        xy = _project(located, ref_lat)
+        capacity = max(1, math.ceil(len(located) / days))
+        labels, cents = cluster_days(xy, days, capacity)
+
+        # Day 1 is the group holding the best-ranked place, and so on
+        groups = sorted(set(labels.tolist()), key=lambda c: int(np.where(labels == c)[0][0]))
+        for d, c in enumerate(groups):
+            idx = np.where(labels == c)[0]
+            order = order_route(_distance_matrix(xy[idx], xy[idx]))
+            day_atts[d] = [located[idx[o]] for o in order]
+            centroids[d] = cents[c]
+
+    # Places without coordinates go to the days with free slots
+    for place in unlocated:
+        d = min(range(days), key=lambda i: len(day_atts[i]))
+        day_atts[d].append(place)
+
+    # Restaurants: nearest unused candidates to each day's centre
+    rest_idx = [i for i, r in enumerate(restaurants) if _has_coords(r)]
+    rest_xy = _project([restaurants[i] for i in rest_idx], ref_lat) if rest_idx and located else None
+    used = set()
+    day_rests = []
+    for d in range(days):
+        picks = []
+        if rest_xy is not None and centroids[d] is not None:
+            nearest = np.argsort(np.linalg.norm(rest_xy - centroids[d], axis=1))
+            picks = [rest_idx[i] for i in nearest if rest_idx[i] not in used][:restaurants_per_day]
+        # Top up in rank order (e.g. days without located attractions)
+        for i in range(len(restaurants)):
+            if len(picks) >= restaurants_per_day:
+                break
+            if i not in used and i not in picks:
+                picks.append(i)
+        used.update(picks)
+        day_rests.append([restaurants[i] for i in picks])
+
+    return [
+        {
+            "day": d + 1,
+            "attractions": day_atts[d],
+            "restaurants": day_rests[d],
+            "distance_km": route_distance_km(day_atts[d])
+        }
+        for d in range(days)
+    ]
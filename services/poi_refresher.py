@@ -0,0 +1,169 @@
+# services/poi_refresher.py
+"""
+Background refresh and pre-warming for the local POI store.
+
+    python -m services.poi_refresher Toronto Waterloo          # pre-warm cities
+    python -m services.poi_refresher --all-filters Toronto     # every travel type / theme query
+    python -m services.poi_refresher --stale                   # re-crawl stale searches once
+"""
+import os, sys, time, argparse, threading
+from dotenv import load_dotenv
+from services.http_client import get_json
+from services.cache import normalize_key
+from services.metrics import inc
+from services.poi_store import POIStore, get_store, POI_STORE_PATH
+from services.place_details import DETAILS_URL, details_cache
+from services.places_service import (
+    PLACES_KEY, TEXT_SEARCH_URL, PAGE_TOKEN_DELAY, PAGE_TOKEN_RETRIES, text_search_cache, search_entry,
+    _build_queries, _page_params, _has_next_page, _token_wait, _token_pending, _record_page
+)
+
+load_dotenv()
+# Seconds between background sweeps for stale searches (0 disables the refresher)
+POI_REFRESH_INTERVAL = float(os.getenv("POI_REFRESH_INTERVAL", "3600"))
+POI_REFRESH_PAGES = int(os.getenv("POI_REFRESH_PAGES", "3"))
+# How many places per search also get their Place Details refreshed
+POI_REFRESH_DETAILS = int(os.getenv("POI_REFRESH_DETAILS", "20"))
+
+# First-page statuses whose results may replace the stored ones
+STORABLE_STATUSES = ("OK", "ZERO_RESULTS")
+
+TRAVEL_TYPES = [None, "solo", "couple", "family", "friends"]
+ACTIVITY_THEMES = [None, "relaxing", "adventure", "cultural", "shopping"]
+
+_stop = threading.Event()
+
+
+def crawl_search(query: str, max_pages: int = POI_REFRESH_PAGES):
+    """
+    Fresh Text Search with next_page_token pagination (up to max_pages pages, no cache
+    reads or writes). Returns (results, status of the first page); errors are raised.
+    """
+    key = normalize_key(query)
+    entry, status = None, None
+    while _has_next_page(entry, max_pages):
+        delay = _token_wait(entry)
+        for _ in range(PAGE_TOKEN_RETRIES + 1):
+            time.sleep(delay)
+            data = get_json(TEXT_SEARCH_URL, _page_params(query, entry), endpoint="textsearch")
+            if not _token_pending(entry, data):
+                break
+            delay = PAGE_TOKEN_DELAY
+        if entry is None:
+            status = data.get("status")
+        entry = _record_page(key, query, entry, data, use_cache=False)
+    return entry["results"], status
+
+
+def refresh_details(store: POIStore, place_id: str):
+    """Re-fetch the details fields already known for a place (photos by default)."""
+    known = store.get_details(place_id, max_age=float("inf"))
+    fields = known["fields"] if known else ["photos"]
+    data = get_json(
+        DETAILS_URL, {"place_id": place_id, "fields": ",".join(fields), "key": PLACES_KEY},
+        endpoint="details"
+    )
+    if data.get("status") == "OK":
+        entry = {"fields": sorted(fields), "result": data.get("result", {})}
+        store.put_details(place_id, entry)
+        details_cache.set(place_id, entry)
+
+
+def refresh_query(store: POIStore, query: str, destination: str = None,
+                  max_pages: int = POI_REFRESH_PAGES, details_limit: int = POI_REFRESH_DETAILS):
+    """
+    Re-crawl one search into the store (and the in-process cache). Returns the number of
+    results, or None when Google refused the search (quota, denied key): the stored row
+    is then kept as it was, to be retried on the next sweep.
+    """
+    key = normalize_key(query)
+    results, status = crawl_search(query, max_pages=max_pages)
+    if status not in STORABLE_STATUSES:
+        inc("poi_refresh_total", result="failed", status=status)
+        return None
+    inc("poi_refresh_total", result="stored", status=status)
+    store.put_search(key, query, results, destination=destination)
+    text_search_cache.set(key, search_entry(results, pages=max_pages))
+
+    for r in results[:details_limit]:
+        if r.get("place_id"):
+            try:
+                refresh_details(store, r["place_id"])
+            except Exception:
+                continue
+    return len(results)
+
+
+def warm_destination(store: POIStore, destination: str, all_filters: bool = False,
+                     max_pages: int = POI_REFRESH_PAGES):
+    """Crawl the queries fetch_pois_for_destination_async would issue for a city."""
+    queries = set()
+    combos = [(t, a) for t in TRAVEL_TYPES for a in ACTIVITY_THEMES] if all_filters else [(None, None)]
+    for travel_type, theme in combos:
+        queries.update(_build_queries(destination, travel_type, theme))
+
+    total = 0
+    for query in sorted(queries):
+        total += refresh_query(store, query, destination=destination, max_pages=max_pages) or 0
+    return total
+
+
+def refresh_stale(store: POIStore, limit: int = 100):
+    """Re-crawl searches older than the store's max age; returns how many were refreshed."""
+    refreshed = 0
+    for query, destination in store.stale_searches(limit=limit):
+        if _stop.is_set():
+            break
+        try:
+            if refresh_query(store, query, destination=destination) is not None:
+                refreshed += 1
+        except Exception:
+            continue
+    return refreshed
+
+
+def _refresh_loop(store: POIStore, interval: float):
+    while not _stop.wait(interval):
+        refresh_stale(store)
+
+
+def start_background_refresh():
+    """Start the stale-search sweeper thread when the POI store is enabled."""
+    store = get_store()
+    if store is None or POI_REFRESH_INTERVAL <= 0:
+        return None
+    _stop.clear()
+    thread = threading.Thread(
+        target=_refresh_loop, args=(store, POI_REFRESH_INTERVAL), name="poi-refresher", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def stop_background_refresh():
+    _stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-warm or refresh the local POI store.")
+    parser.add_argument("cities", nargs="*", help="Destinations to crawl, e.g. Toronto Waterloo")
+    parser.add_argument("--all-filters", action="store_true", help="Also crawl every travel type/theme query")
+    parser.add_argument("--pages", type=int, default=POI_REFRESH_PAGES, help="Text Search pages per query")
+    parser.add_argument("--stale", action="store_true", help="Re-crawl stale searches")
+    parser.add_argument("--path", default=POI_STORE_PATH, help="SQLite file for the store")
+    args = parser.parse_args()
+
+    if not args.cities and not args.stale:
+        parser.error("give at least one city or --stale")
+
+    store = POIStore(args.path)
+    for city in args.cities:
+        count = warm_destination(store, city, all_filters=args.all_filters, max_pages=args.pages)
+        print(f"{city}: {count} results stored")
+    if args.stale:
+        print(f"refreshed {refresh_stale(store)} stale searches")
+    print(store.stats())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
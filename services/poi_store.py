@@ -0,0 +1,223 @@
+# services/poi_store.py
+import os, json, math, time, asyncio, sqlite3, threading
+from dotenv import load_dotenv
+from services.cache import SQLiteCache
+
+load_dotenv()
+
+# Persistent local store of Places results (disabled unless POI_STORE_ENABLED=true)
+POI_STORE_ENABLED = os.getenv("POI_STORE_ENABLED", "false").lower() == "true"
+POI_STORE_PATH = os.getenv("POI_STORE_PATH", "poi_store.sqlite3")
+# Data older than this (seconds) is not served and is picked up by the refresher
+POI_STORE_MAX_AGE = float(os.getenv("POI_STORE_MAX_AGE", str(7 * 24 * 3600)))
+
+# Grid spatial index: cells of GRID_DEG degrees (~1.1 km of latitude)
+GRID_DEG = 0.01
+KM_PER_DEG_LAT = 111.32
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pois (
+    place_id TEXT PRIMARY KEY,
+    name TEXT,
+    lat REAL,
+    lon REAL,
+    cell_lat INTEGER,
+    cell_lon INTEGER,
+    rating REAL,
+    user_ratings_total INTEGER,
+    price_level INTEGER,
+    types TEXT,
+    raw TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS pois_cell ON pois (cell_lat, cell_lon);
+CREATE INDEX IF NOT EXISTS pois_rating ON pois (rating);
+CREATE INDEX IF NOT EXISTS pois_price ON pois (price_level);
+
+CREATE TABLE IF NOT EXISTS searches (
+    query_key TEXT PRIMARY KEY,
+    query TEXT,
+    destination TEXT,
+    place_ids TEXT,
+    fetched_at REAL
+);
+CREATE INDEX IF NOT EXISTS searches_fetched ON searches (fetched_at);
+
+CREATE TABLE IF NOT EXISTS details (
+    place_id TEXT PRIMARY KEY,
+    fields TEXT,
+    result TEXT,
+    fetched_at REAL
+);
+"""
+
+
+def grid_cell(lat: float, lon: float):
+    return math.floor(lat / GRID_DEG), math.floor(lon / GRID_DEG)
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+class POIStore:
+    """SQLite-backed store for Text Search results, Place Details and a lat/lon grid index."""
+
+    def __init__(self, path: str = POI_STORE_PATH, max_age: float = POI_STORE_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _fresh(self, fetched_at: float, max_age: float = None):
+        return time.time() - fetched_at <= (self.max_age if max_age is None else max_age)
+
+    # ----------- Text Search results -----------
+    def get_search(self, query_key: str, max_age: float = None):
+        """Raw Text Search results for a query, or None if unknown or stale."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT place_ids, fetched_at FROM searches WHERE query_key = ?", (query_key,)
+            ).fetchone()
+            if row is None or not self._fresh(row[1], max_age):
+                return None
+            place_ids = json.loads(row[0])
+            if not place_ids:
+                return []
+            marks = ",".join("?" * len(place_ids))
+            raws = dict(self._conn.execute(
+                f"SELECT place_id, raw FROM pois WHERE place_id IN ({marks})", place_ids
+            ).fetchall())
+        return [json.loads(raws[pid]) for pid in place_ids if pid in raws]
+
+    def put_search(self, query_key: str, query: str, results: list, destination: str = None):
+        """Store a Text Search result list (in order) and upsert each place."""
+        now = time.time()
+        rows = []
+        for r in results:
+            pid = r.get("place_id")
+            if not pid:
+                continue
+            loc = r.get("geometry", {}).get("location", {})
+            lat, lon = loc.get("lat"), loc.get("lng")
+            cell_lat, cell_lon = grid_cell(lat, lon) if lat is not None and lon is not None else (None, None)
+            rows.append((
+                pid, r.get("name"), lat, lon, cell_lat, cell_lon, r.get("rating"),
+                r.get("user_ratings_total"), r.get("price_level"),
+                json.dumps(r.get("types", [])), json.dumps(r), now,
+            ))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pois VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO searches VALUES (?, ?, COALESCE(?, "
+                " (SELECT destination FROM searches WHERE query_key = ?)), ?, ?)",
+                (query_key, query, destination, query_key, json.dumps([row[0] for row in rows]), now),
+            )
+            self._conn.commit()
+
+    def stale_searches(self, max_age: float = None, limit: int = 100):
+        """(query, destination) pairs whose results are older than max_age, oldest first."""
+        cutoff = time.time() - (self.max_age if max_age is None else max_age)
+        with self._lock:
+            return self._conn.execute(
+                "SELECT query, destination FROM searches WHERE fetched_at < ?"
+                " ORDER BY fetched_at LIMIT ?", (cutoff, limit)
+            ).fetchall()
+
+    # ----------- Place Details -----------
+    def get_details(self, place_id: str, max_age: float = None):
+        """Stored details entry ({"fields": [...], "result": {...}}) or None if unknown or stale."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fields, result, fetched_at FROM details WHERE place_id = ?", (place_id,)
+            ).fetchone()
+        if row is None or not self._fresh(row[2], max_age):
+            return None
+        return {"fields": json.loads(row[0]), "result": json.loads(row[1])}
+
+    def put_details(self, place_id: str, entry: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO details VALUES (?, ?, ?, ?)",
+                (place_id, json.dumps(entry["fields"]), json.dumps(entry["result"]), time.time()),
+            )
+            self._conn.commit()
+
+    def iter_details(self):
+        """Every stored details result, fresh or not (e.g. reviews for an offline corpus)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT result FROM details").fetchall()
+        for (result,) in rows:
+            yield json.loads(result)
+
+    # ----------- Spatial queries -----------
+    def nearby(self, lat: float, lon: float, radius_km: float,
+               min_rating: float = None, max_price: int = None, place_type: str = None,
+               limit: int = 50):
+        """
+        Places within radius_km of (lat, lon), best rated first.
+        The grid index narrows candidates to the covering cells; exact distance is checked after.
+        """
+        d_lat = math.ceil(radius_km / (KM_PER_DEG_LAT * GRID_DEG))
+        d_lon = math.ceil(radius_km / (KM_PER_DEG_LAT * GRID_DEG * max(0.01, math.cos(math.radians(lat)))))
+        c_lat, c_lon = grid_cell(lat, lon)
+
+        sql = ("SELECT raw, lat, lon FROM pois WHERE cell_lat BETWEEN ? AND ? AND cell_lon BETWEEN ? AND ?")
+        args = [c_lat - d_lat, c_lat + d_lat, c_lon - d_lon, c_lon + d_lon]
+        if min_rating is not None:
+            sql += " AND rating >= ?"
+            args.append(min_rating)
+        if max_price is not None:
+            sql += " AND (price_level IS NULL OR price_level <= ?)"
+            args.append(max_price)
+        if place_type:
+            sql += " AND types LIKE ?"
+            args.append(f'%"{place_type}"%')
+        sql += " ORDER BY rating DESC"
+
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        out = [json.loads(raw) for raw, plat, plon in rows
+               if _haversine_km(lat, lon, plat, plon) <= radius_km]
+        return out[:limit]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pois": self._conn.execute("SELECT COUNT(*) FROM pois").fetchone()[0],
+                "searches": self._conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0],
+                "details": self._conn.execute("SELECT COUNT(*) FROM details").fetchone()[0],
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The shared POIStore, or None when the store is disabled."""
+    global _store
+    if not POI_STORE_ENABLED:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = POIStore()
+    return _store
+
+
+async def off_loop(cache, fn, *args):
+    """
+    fn(*args) from async code: in a worker thread when it may block on SQLite
+    (`cache` is SQLite-backed or the POI store is enabled), otherwise inline.
+    """
+    if isinstance(cache, SQLiteCache) or get_store() is not None:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
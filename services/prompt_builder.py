@@ -0,0 +1,76 @@
+# services/prompt_builder.py
+import os
+
+# Upper bound on the itinerary prompt size (estimated tokens)
+PROMPT_TOKEN_BUDGET = int(os.getenv("ITINERARY_PROMPT_TOKEN_BUDGET", "3000"))
+
+# Rough chars-per-token ratio for English text with Gemini tokenizers
+CHARS_PER_TOKEN = 4
+
+# Types that say nothing useful about a place
+GENERIC_TYPES = {"point_of_interest", "establishment", "food", "store"}
+
+PRICE_WORDS = {0: "free", 1: "cheap", 2: "moderate", 3: "expensive", 4: "luxury"}
+
+# Detail levels, from richest to leanest; the builder steps down until the prompt fits
+#   types: how many place types to keep, popularity: include review count,
+#   max_atts: attractions kept per day (None = all)
+LEVELS = [
+    {"types": 2, "popularity": True, "max_atts": None},
+    {"types": 1, "popularity": False, "max_atts": None},
+    {"types": 0, "popularity": False, "max_atts": None},
+    {"types": 0, "popularity": False, "max_atts": 3},
+    {"types": 0, "popularity": False, "max_atts": 2},
+]
+
+
+def estimate_tokens(text: str):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _poi_line(place: dict, level: dict):
+    """One POI as a compact `name | rating | price | types` line."""
+    fields = [place.get("name") or "Unknown"]
+    if place.get("rating") is not None:
+        rating = f"{place['rating']}★"
+        if level["popularity"] and place.get("user_ratings_total"):
+            rating += f" ({place['user_ratings_total']} reviews)"
+        fields.append(rating)
+    if place.get("price_level") is not None:
+        fields.append(PRICE_WORDS.get(place["price_level"], str(place["price_level"])))
+    if level["types"]:
+        types = [t for t in place.get("types", []) if t not in GENERIC_TYPES][:level["types"]]
+        if types:
+            fields.append(", ".join(t.replace("_", " ") for t in types))
+    return "- " + " | ".join(fields)
+
+
+def encode_plan(plan_struct: list, level: dict):
+    """Project plan_struct to the fields the planner needs, one line per place."""
+    lines = []
+    for day in plan_struct:
+        atts = day.get("attractions", [])
+        if level["max_atts"] is not None:
+            atts = atts[:level["max_atts"]]
+        lines.append(f"Day {day.get('day')}")
+        lines.append("Attractions:")
+        lines.extend(_poi_line(p, level) for p in atts)
+        lines.append("Restaurants:")
+        lines.extend(_poi_line(p, level) for p in day.get("restaurants", []))
+    return "\n".join(lines)
+
+
+def fit_plan(plan_struct: list, fixed_text: str, budget: int = None):
+    """
+    Encode plan_struct at the richest level that keeps the whole prompt
+    (fixed_text + POI block) within the token budget; the leanest level is
+    used if nothing fits. Returns (poi_block, prompt_tokens).
+    """
+    budget = budget or PROMPT_TOKEN_BUDGET
+    fixed_tokens = estimate_tokens(fixed_text)
+    for level in LEVELS:
+        block = encode_plan(plan_struct, level)
+        tokens = fixed_tokens + estimate_tokens(block)
+        if tokens <= budget:
+            break
+    return block, tokens
@@ -0,0 +1,305 @@
+# services/resilience.py
+"""
+Failure handling for upstream calls (Google Places, Gemini):
+
+- a per-request deadline every outbound call is capped by
+- a circuit breaker per upstream, so a failing API is skipped instead of waited on
+- fallback counters, recorded wherever a caller degrades instead of failing
+- hedged calls: a duplicate request when the first one is slow
+"""
+import os, time, asyncio, threading, contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+
+load_dotenv()
+# Seconds an API request may spend waiting on upstreams (0 disables)
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "25"))
+# Consecutive failures that open a breaker, and seconds before one trial call is let through
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+# Send a duplicate Place Details request when the first has not answered after this
+# many seconds (0 disables hedging)
+PLACES_HEDGE_DELAY = float(os.getenv("PLACES_HEDGE_DELAY", "0"))
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "16"))
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised before an upstream call when the request's deadline has passed."""
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+# ----------- Deadlines -----------
+# Absolute time.monotonic() deadline of the current request, set by deadline_scope()
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(seconds: float = REQUEST_DEADLINE):
+    """Cap upstream calls in this context (and threads/tasks copied from it) to `seconds` from now."""
+    token = _deadline.set(time.monotonic() + seconds if seconds and seconds > 0 else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Seconds left before the current deadline, or None when there is none."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline(what: str = "upstream call"):
+    """Raise DeadlineExceeded when no time is left; returns the seconds remaining (or None)."""
+    left = remaining()
+    if left is not None and left <= 0:
+        _count(_deadlines, what)
+        raise DeadlineExceeded(f"{what}: request deadline exceeded")
+    return left
+
+
+def cap_timeout(timeout: float, what: str = "upstream call"):
+    """`timeout` shortened to the time left before the deadline."""
+    left = check_deadline(what)
+    return timeout if left is None else min(timeout, left)
+
+
+# ----------- Circuit breakers -----------
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitBreaker:
+    """
+    closed: calls pass; `failures` consecutive failures open the breaker.
+    open: calls fail fast with CircuitOpenError for `reset_after` seconds.
+    half_open: one trial call passes; success closes the breaker, failure reopens it.
+    """
+
+    def __init__(self, name: str, failures: int = BREAKER_FAILURES, reset_after: float = BREAKER_RESET):
+        self.name = name
+        self.failures = failures
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self.rejected = 0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = "half_open"
+            if self.state == "closed":
+                return
+            if self.state == "half_open" and not self._trial:
+                self._trial = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f"{self.name}: circuit open")
+
+    def success(self):
+        with self._lock:
+            self.state, self.consecutive, self._trial = "closed", 0, False
+
+    def failure(self):
+        with self._lock:
+            self.consecutive += 1
+            self._trial = False
+            if self.state == "half_open" or self.consecutive >= self.failures:
+                if self.state != "open":
+                    self.opens += 1
+                self.state, self.opened_at = "open", time.monotonic()
+
+    def release(self):
+        """The call ended without saying anything about the upstream (e.g. cancelled)."""
+        with self._lock:
+            self._trial = False
+
+    @contextmanager
+    def guard(self, is_failure=None):
+        """
+        Wrap one upstream call. Exceptions for which is_failure(e) is false (e.g. a 404)
+        and DeadlineExceeded do not count against the upstream.
+        """
+        self.allow()
+        try:
+            yield
+        except DeadlineExceeded:
+            self.release()
+            raise
+        except Exception as e:
+            if is_failure is None or is_failure(e):
+                self.failure()
+            else:
+                self.success()
+            raise
+        except BaseException:
+            self.release()
+            raise
+        else:
+            self.success()
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive,
+            "opens": self.opens,
+            "rejected": self.rejected,
+        }
+
+
+def get_breaker(name: str):
+    """The shared breaker for an upstream, created on first use."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+# ----------- Fallback / hedge / deadline counters -----------
+_counts_lock = threading.Lock()
+_fallbacks = {}  # (upstream, kind) -> count
+_hedges = {}     # (upstream, "sent" | "won") -> count
+_deadlines = {}  # what -> count
+
+
+def _count(table: dict, key):
+    with _counts_lock:
+        table[key] = table.get(key, 0) + 1
+
+
+def record_fallback(upstream: str, kind: str):
+    """Count a degraded answer: kind is e.g. "stale" (old stored data) or "empty"/"degraded"."""
+    _count(_fallbacks, (upstream, kind))
+
+
+def get_resilience_stats():
+    with _counts_lock:
+        fallbacks, hedges, deadlines = dict(_fallbacks), dict(_hedges), dict(_deadlines)
+    return {
+        "breakers": {name: b.stats() for name, b in _breakers.items()},
+        "fallbacks": {f"{up}:{kind}": n for (up, kind), n in fallbacks.items()},
+        "hedges": {f"{up}:{result}": n for (up, result), n in hedges.items()},
+        "deadline_exceeded": deadlines,
+    }
+
+
+# ----------- Hedged calls -----------
+_hedge_pool = None
+_hedge_pool_lock = threading.Lock()
+# One slot per pool worker: a call only goes to the pool when a worker is free, so time
+# spent queued is never mistaken for a slow upstream
+_hedge_slots = threading.BoundedSemaphore(HEDGE_WORKERS)
+
+
+def _get_hedge_pool():
+    global _hedge_pool
+    if _hedge_pool is None:
+        with _hedge_pool_lock:
+            if _hedge_pool is None:
+                _hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+    return _hedge_pool
+
+
+def _worth_hedging(delay: float):
+    left = remaining()
+    return delay > 0 and (left is None or left > delay)
+
+
+def _submit(fn, *args, **kwargs):
+    """Run fn on a hedge worker; the caller holds a slot, which is released when fn returns."""
+    def run():
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _hedge_slots.release()
+
+    try:
+        return _get_hedge_pool().submit(contextvars.copy_context().run, run)
+    except BaseException:
+        _hedge_slots.release()
+        raise
+
+
+def hedged(upstream: str, delay: float, fn, *args, before_hedge=None, **kwargs):
+    """
+    fn(*args, **kwargs), plus a second identical call if the first has not finished after
+    `delay` seconds; the first success wins (the slower call's result is dropped).
+    before_hedge() runs just before the second call (e.g. to take a rate-limit token);
+    when it raises DeadlineExceeded the hedge is skipped and the first call awaited.
+    Each call needs a free hedge worker: without one the first call runs on the calling
+    thread unhedged (or the hedge is skipped), so a busy pool adds neither load nor delay.
+    """
+    if not _worth_hedging(delay) or not _hedge_slots.acquire(blocking=False):
+        return fn(*args, **kwargs)
+    first = _submit(fn, *args, **kwargs)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+
+    if not _hedge_slots.acquire(blocking=False):
+        return first.result()
+    if before_hedge:
+        try:
+            before_hedge()
+        except BaseException as e:
+            _hedge_slots.release()
+            if isinstance(e, DeadlineExceeded):
+                return first.result()
+            raise
+    _count(_hedges, (upstream, "sent"))
+    second = _submit(fn, *args, **kwargs)
+    pending, error = {first, second}, None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is second:
+                    _count(_hedges, (upstream, "won"))
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+async def ahedged(upstream: str, delay: float, fn, *args, before_hedge=None, **kwargs):
+    """
+    Async version of hedged; `fn` (and before_hedge, if given) are coroutine
+    functions, and the slower call is cancelled.
+    """
+    if not _worth_hedging(delay):
+        return await fn(*args, **kwargs)
+    first = asyncio.ensure_future(fn(*args, **kwargs))
+    pending = {first}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return first.result()
+
+        if before_hedge:
+            try:
+                await before_hedge()
+            except DeadlineExceeded:
+                return await first
+        _count(_hedges, (upstream, "sent"))
+        second = asyncio.ensure_future(fn(*args, **kwargs))
+        pending, error = {first, second}, None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        _count(_hedges, (upstream, "won"))
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
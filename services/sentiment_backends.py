@@ -0,0 +1,81 @@
+# services/sentiment_backends.py
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SENTIMENT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+MAX_TOKENS = 512
+
+# pipeline (fp32 PyTorch) | quantized (dynamic int8 PyTorch) | onnx (ONNX Runtime via optimum)
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "pipeline").lower()
+BACKENDS = ("pipeline", "quantized", "onnx")
+
+
+def build_pipeline(backend: str = None):
+    """Build a transformers sentiment pipeline for the selected backend."""
+    backend = (backend or SENTIMENT_BACKEND).lower()
+    from transformers import pipeline
+
+    if backend == "pipeline":
+        return pipeline("sentiment-analysis", model=SENTIMENT_MODEL)
+
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(SENTIMENT_MODEL)
+
+    if backend == "quantized":
+        import torch
+        from transformers import AutoModelForSequenceClassification
+        model = AutoModelForSequenceClassification.from_pretrained(SENTIMENT_MODEL)
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+
+    if backend == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+        except ImportError as e:
+            raise ImportError(
+                "SENTIMENT_BACKEND=onnx requires `pip install optimum[onnxruntime]`"
+            ) from e
+        model = ORTModelForSequenceClassification.from_pretrained(SENTIMENT_MODEL, export=True)
+        return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+
+    raise ValueError(f"Unknown SENTIMENT_BACKEND '{backend}' (expected one of {', '.join(BACKENDS)})")
+
+
+def run_pipeline(pipe, texts, batch_size: int):
+    """Score `texts` in padded batches; None marks a text that failed."""
+    try:
+        return pipe(texts, batch_size=batch_size, truncation=True, max_length=MAX_TOKENS)
+    except Exception:
+        # Fall back to one at a time so a single bad review doesn't drop the batch
+        outs = []
+        for text in texts:
+            try:
+                outs.append(pipe(text, truncation=True, max_length=MAX_TOKENS)[0])
+            except Exception:
+                outs.append(None)
+        return outs
+
+
+# ----------- Process-pool worker side -----------
+_worker_pipe = None
+
+
+def init_worker(backend: str, torch_threads: int):
+    """Process-pool initializer: pin torch threads and load the model once per worker."""
+    global _worker_pipe
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    _worker_pipe = build_pipeline(backend)
+
+
+def worker_score(texts, batch_size: int):
+    """Run inference inside a worker process (outputs are plain dicts, so they pickle)."""
+    return [
+        {"label": o["label"], "score": float(o["score"])} if o is not None else None
+        for o in run_pipeline(_worker_pipe, texts, batch_size)
+    ]
@@ -1,75 +1,308 @@
 # services/sentiment_service.py
-import os, requests, numpy as np
+import os, time, hashlib, threading, multiprocessing, contextvars, numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from dotenv import load_dotenv
-from transformers import pipeline
-from sklearn.feature_extraction.text import CountVectorizer
-from services.gemini_service import generate_itinerary_text
-import google.generativeai as genai
+from services.gemini_service import generate_text
+from services.place_details import get_place_details, get_stale_details
+from services.resilience import record_fallback, deadline_scope
+from services.metrics import timed, inc
+from services.cache import make_cache, MISS
+from services.keywords import get_engine
+from services.sentiment_backends import (
+    SENTIMENT_MODEL, SENTIMENT_BACKEND, MAX_TOKENS,
+    build_pipeline, run_pipeline, init_worker, worker_score,
+)
 
 
 load_dotenv()
-GEMINI_KEY = os.getenv("GEMINI_API_KEY")
 MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-genai.configure(api_key=GEMINI_KEY)
 
-PLACES_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
-DETAILS_URL = "https://maps.googleapis.com/maps/api/place/details/json"
+# Batched inference tuning
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "16"))
+SENTIMENT_CHUNK_LONG = os.getenv("SENTIMENT_CHUNK_LONG", "false").lower() == "true"
+
+# Parallelism for /sentiment/batch (review fetches and Gemini summaries)
+SENTIMENT_BATCH_CONCURRENCY = int(os.getenv("SENTIMENT_BATCH_CONCURRENCY", "8"))
+
+SENTIMENT_WARMUP = os.getenv("SENTIMENT_WARMUP", "false").lower() == "true"
+
+# Process-pool inference (0 = run the model in the request thread)
+SENTIMENT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", "0"))
+SENTIMENT_MAX_PENDING = int(os.getenv("SENTIMENT_MAX_PENDING", str(max(1, SENTIMENT_WORKERS) * 4)))
+SENTIMENT_TORCH_THREADS = int(os.getenv("SENTIMENT_TORCH_THREADS", "1"))
 
-# Initialize DistilBERT model (cached)
-sentiment_pipeline = pipeline(
-    "sentiment-analysis",
-    model="distilbert-base-uncased-finetuned-sst-2-english"
+# Per-review results keyed by a content hash, and per-place aggregates updated as a
+# place's review set changes (backend defaults to CACHE_BACKEND; "sqlite" survives restarts)
+SENTIMENT_CACHE_BACKEND = os.getenv("SENTIMENT_CACHE_BACKEND") or None
+SENTIMENT_CACHE_TTL = float(os.getenv("SENTIMENT_CACHE_TTL", str(30 * 24 * 3600)))
+SENTIMENT_CACHE_MAXSIZE = int(os.getenv("SENTIMENT_CACHE_MAXSIZE", "100000"))
+
+review_cache = make_cache(
+    "review_sentiment", maxsize=SENTIMENT_CACHE_MAXSIZE, ttl=SENTIMENT_CACHE_TTL, backend=SENTIMENT_CACHE_BACKEND
+)
+place_aggregates = make_cache(
+    "sentiment_place_aggregates", maxsize=SENTIMENT_CACHE_MAXSIZE // 10, ttl=SENTIMENT_CACHE_TTL,
+    backend=SENTIMENT_CACHE_BACKEND
 )
 
+# Sentiment model, loaded on first use (transformers/torch are imported lazily)
+_pipeline = None
+_tokenizer = None
+_executor = None
+_pipeline_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(SENTIMENT_MAX_PENDING)
+_model_state = {"status": "not_loaded", "load_seconds": None, "error": None}
+
+
+def _load(loader):
+    """Run `loader` while tracking load state and timing."""
+    _model_state.update(status="loading", error=None)
+    start = time.perf_counter()
+    try:
+        result = loader()
+    except Exception as e:
+        _model_state.update(status="error", error=str(e))
+        raise
+    _model_state.update(status="ready", load_seconds=round(time.perf_counter() - start, 2))
+    return result
+
+
+def get_sentiment_pipeline():
+    """Return the shared in-process sentiment pipeline, loading it once in a thread-safe way."""
+    global _pipeline
+    if _pipeline is not None:
+        return _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = _load(build_pipeline)
+    return _pipeline
+
+
+def _get_executor():
+    """Bounded process pool whose workers each hold their own copy of the model."""
+    global _executor
+    if _executor is None:
+        with _pipeline_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=SENTIMENT_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_worker,
+                    initargs=(SENTIMENT_BACKEND, SENTIMENT_TORCH_THREADS),
+                )
+    return _executor
+
+
+def _reset_executor(broken):
+    """Drop a broken pool (only if it is still the current one) so the next call starts a fresh one."""
+    global _executor
+    with _pipeline_lock:
+        if _executor is not broken:
+            return
+        _executor = None
+        _model_state["status"] = "not_loaded"
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _get_tokenizer():
+    """Tokenizer for chunking; avoids loading the model when inference runs in workers."""
+    global _tokenizer
+    if _tokenizer is None:
+        if SENTIMENT_WORKERS > 0:
+            from transformers import AutoTokenizer
+            _tokenizer = AutoTokenizer.from_pretrained(SENTIMENT_MODEL)
+        else:
+            _tokenizer = get_sentiment_pipeline().tokenizer
+    return _tokenizer
+
+
+def warmup_model():
+    """Load the model and run one tiny inference so the first request is fast."""
+    try:
+        if SENTIMENT_WORKERS > 0:
+            executor = _get_executor()
+            _load(lambda: [f.result() for f in [
+                executor.submit(worker_score, ["warmup"], 1) for _ in range(SENTIMENT_WORKERS)
+            ]])
+        else:
+            get_sentiment_pipeline()("warmup")
+    except Exception:
+        pass
+
+
+def start_warmup():
+    """Warm the model in a background thread (no-op unless SENTIMENT_WARMUP=true)."""
+    if SENTIMENT_WARMUP and _model_state["status"] == "not_loaded":
+        threading.Thread(target=warmup_model, name="sentiment-warmup", daemon=True).start()
+
+
+def model_state():
+    """Current model load state for readiness checks."""
+    return {
+        "model": SENTIMENT_MODEL,
+        "backend": SENTIMENT_BACKEND,
+        "workers": SENTIMENT_WORKERS,
+        "warmup": SENTIMENT_WARMUP,
+        **_model_state,
+    }
+
 
 # ----------- Fetch Google Reviews -----------
+@timed("sentiment.details")
 def get_place_reviews(place_id: str, max_reviews: int = 5):
-    """Fetch up to 5 latest reviews for a given Google place."""
+    """
+    Fetch up to 5 latest reviews for a given Google place.
+    When Place Details fails (or its breaker is open), the last stored reviews are used.
+    """
     try:
-        params = {"place_id": place_id, "fields": "reviews", "key": PLACES_KEY}
-        resp = requests.get(DETAILS_URL, params=params, timeout=20)
-        resp.raise_for_status()
-        data = resp.json()
-        reviews = data.get("result", {}).get("reviews", [])
-        return [r.get("text", "") for r in reviews if r.get("text")]
+        result = get_place_details(place_id, fields=("reviews",))
     except Exception:
-        return []
+        result = get_stale_details(place_id, fields=("reviews",))
+        record_fallback("places.details", "stale" if result is not None else "no_reviews")
+        if result is None:
+            return []
+    reviews = result.get("reviews", [])
+    return [r.get("text", "") for r in reviews if r.get("text")]
 
 
 # ----------- Analyze Sentiment Using DistilBERT -----------
-def analyze_reviews(reviews):
-    results = []
-    for text in reviews:
-        try:
-            out = sentiment_pipeline(text[:512])[0]  # Truncate long reviews
-            results.append({
-                "text": text,
-                "label": out["label"],
-                "score": round(out["score"], 3)
-            })
-        except Exception:
+def _to_result(text, label, score):
+    return {"text": text, "label": label, "score": round(score, 3)}
+
+
+def _chunk_text(text: str):
+    """Split a review into pieces that each fit in the model's token window."""
+    tokenizer = _get_tokenizer()
+    ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+    window = MAX_TOKENS - 2  # room for [CLS] / [SEP]
+    if len(ids) <= window:
+        return [text]
+    return [tokenizer.decode(ids[i:i + window]) for i in range(0, len(ids), window)]
+
+
+def review_key(text: str, chunk_long: bool):
+    """Content hash of a review; the model, backend and chunking mode are part of the key."""
+    mode = "chunked" if chunk_long else "truncated"
+    return hashlib.sha256(f"{SENTIMENT_MODEL}|{SENTIMENT_BACKEND}|{mode}|{text}".encode("utf-8")).hexdigest()
+
+
+def _score_batch(texts, batch_size):
+    """Run the model over `texts` in padded batches; None marks a text that failed."""
+    if SENTIMENT_WORKERS > 0:
+        # Blocks when SENTIMENT_MAX_PENDING batches are already queued (backpressure)
+        with _pending:
+            executor = _get_executor()
+            run = lambda: executor.submit(worker_score, texts, batch_size).result()
+            try:
+                return _load(run) if _model_state["status"] == "not_loaded" else run()
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM); start a fresh pool on the next call
+                _reset_executor(executor)
+                raise
+    return run_pipeline(get_sentiment_pipeline(), texts, batch_size)
+
+
+def _score_reviews(texts, batch_size: int, chunk_long: bool):
+    """
+    Model pass over distinct review texts; returns {text: {"label", "score", "chunks"}}.
+    A review whose scoring failed is left out.
+    """
+    # Flatten to (review index, text piece) so every piece goes through one pass
+    flat_texts, owners = [], []
+    for idx, text in enumerate(texts):
+        pieces = [text]
+        if chunk_long:
+            try:
+                pieces = _chunk_text(text)
+            except Exception:
+                pass
+        flat_texts.extend(pieces)
+        owners.extend([idx] * len(pieces))
+
+    outs = _score_batch(flat_texts, batch_size) if flat_texts else []
+
+    # Group piece outputs per review; a failed piece drops the whole review
+    per_review = {}
+    for idx, out in zip(owners, outs):
+        per_review.setdefault(idx, []).append(out)
+
+    scored = {}
+    for idx, text in enumerate(texts):
+        pieces = per_review.get(idx, [None])
+        if any(out is None for out in pieces):
             continue
-    return results
+        if len(pieces) == 1:
+            label, score = pieces[0]["label"], pieces[0]["score"]
+        else:
+            # Average the positive-class probability across chunks
+            p = float(np.mean([o["score"] if o["label"] == "POSITIVE" else 1 - o["score"] for o in pieces]))
+            label, score = ("POSITIVE" if p >= 0.5 else "NEGATIVE"), max(p, 1 - p)
+        scored[text] = {"label": label, "score": round(float(score), 3), "chunks": len(pieces)}
+    return scored
+
+
+@timed("sentiment.model")
+def analyze_reviews_many(review_lists, batch_size: int = None, chunk_long: bool = None):
+    """
+    Score several places' reviews in one batched model pass.
+    Returns one result list per input list, in the same shape as analyze_reviews.
+    Reviews already in the per-review cache are not scored again; the model is
+    only loaded when at least one review is new.
+    """
+    batch_size = batch_size or SENTIMENT_BATCH_SIZE
+    chunk_long = SENTIMENT_CHUNK_LONG if chunk_long is None else chunk_long
+
+    # --- Look up every distinct review text in the cache ---
+    known, unseen = {}, []
+    for text in dict.fromkeys(text for texts in review_lists for text in texts):
+        cached = review_cache.get(review_key(text, chunk_long))
+        if cached is MISS:
+            unseen.append(text)
+        else:
+            known[text] = cached
+
+    inc("sentiment_reviews_total", len(known), source="cache")
+    inc("sentiment_reviews_total", len(unseen), source="model")
+
+    # --- Score only the new ones, then remember them ---
+    if unseen:
+        scored = _score_reviews(unseen, batch_size, chunk_long)
+        for text, entry in scored.items():
+            review_cache.set(review_key(text, chunk_long), entry)
+        known.update(scored)
+
+    return [
+        [_to_result(text, known[text]["label"], known[text]["score"]) for text in texts if text in known]
+        for texts in review_lists
+    ]
+
+
+def analyze_reviews(reviews, batch_size: int = None, chunk_long: bool = None):
+    """Score one place's reviews (token-truncated, batched)."""
+    return analyze_reviews_many([list(reviews)], batch_size=batch_size, chunk_long=chunk_long)[0]
 
 
 # ----------- Extract Frequent Keywords -----------
-def extract_keywords(texts, max_keywords=5):
-    if not texts:
-        return []
+@timed("sentiment.keywords")
+def extract_keywords_many(text_lists, max_keywords=5):
+    """Keywords for several places' reviews in one sparse TF-IDF pass (see services.keywords)."""
     try:
-        vectorizer = CountVectorizer(stop_words="english", max_features=50)
-        X = vectorizer.fit_transform(texts)
-        counts = X.toarray().sum(axis=0)
-        vocab = vectorizer.get_feature_names_out()
-        top_indices = counts.argsort()[::-1][:max_keywords]
-        return [vocab[i] for i in top_indices]
+        return get_engine().top_keywords_many([list(texts) for texts in text_lists], max_keywords)
     except Exception:
+        return [[] for _ in text_lists]
+
+
+def extract_keywords(texts, max_keywords=5):
+    if not texts:
         return []
+    return extract_keywords_many([texts], max_keywords)[0]
 
 
 # ----------- Aggregate Review Sentiment -----------
-def summarize_sentiment(results):
-    if not results:
+def _format_summary(n, positives, signed_sum, keywords):
+    """Summary dict from review counts; signed_sum adds positive scores and subtracts negative ones."""
+    if not n:
         return {
             "avg_score": 0,
             "positive_ratio": 0,
@@ -77,14 +310,9 @@ def summarize_sentiment(results):
             "summary": "No reviews available."
         }
 
-    pos = [r["score"] for r in results if r["label"] == "POSITIVE"]
-    neg = [r["score"] for r in results if r["label"] == "NEGATIVE"]
-
-    avg_score = np.mean(pos + [-s for s in neg]) if results else 0
-    positive_ratio = len(pos) / len(results)
-    texts = [r["text"] for r in results]
-    keywords = extract_keywords(texts)
-
+    # Scores carry 3 decimals, so rounding the sum removes drift from incremental updates
+    avg_score = round(signed_sum, 3) / n
+    positive_ratio = positives / n
     summary = f"{positive_ratio*100:.1f}% of reviews are positive with an average score of {avg_score:+.2f}."
 
     return {
@@ -95,13 +323,78 @@ def summarize_sentiment(results):
     }
 
 
+def _signed(label, score):
+    return score if label == "POSITIVE" else -score
+
+
+def summarize_sentiment(results):
+    if not results:
+        return _format_summary(0, 0, 0, [])
+
+    positives = sum(1 for r in results if r["label"] == "POSITIVE")
+    signed_sum = float(sum(_signed(r["label"], r["score"]) for r in results))
+    keywords = extract_keywords([r["text"] for r in results])
+    return _format_summary(len(results), positives, signed_sum, keywords)
+
+
+def _review_counts(results):
+    """{text hash: [label, score, occurrences]} for a place's scored reviews."""
+    counts = {}
+    for r in results:
+        h = hashlib.sha256(r["text"].encode("utf-8")).hexdigest()
+        entry = counts.setdefault(h, [r["label"], r["score"], 0])
+        entry[2] += 1
+    return counts
+
+
+def summarize_place(place_id: str, results, keywords=None):
+    """
+    summarize_sentiment for a place, kept as a running aggregate per place_id.
+    An unchanged review set returns the stored summary; otherwise only the reviews
+    that appeared or dropped out are added to / removed from the totals, and the
+    keywords are recomputed (or taken from `keywords` when already extracted).
+    """
+    if not place_id:
+        return summarize_sentiment(results)
+
+    current = _review_counts(results)
+    agg = place_aggregates.get(place_id)
+    if agg is MISS:
+        agg = {"reviews": {}, "n": 0, "positives": 0, "signed_sum": 0.0, "summary": None}
+    elif agg["reviews"] == current:
+        inc("sentiment_aggregates_total", result="unchanged")
+        return agg["summary"]
+    else:
+        agg = dict(agg)
+
+    # Remove reviews that dropped out (or were rescored), then add the new ones
+    previous = agg["reviews"]
+    for h, (label, score, count) in previous.items():
+        if current.get(h) != [label, score, count]:
+            agg["n"] -= count
+            agg["positives"] -= count if label == "POSITIVE" else 0
+            agg["signed_sum"] -= count * _signed(label, score)
+    for h, (label, score, count) in current.items():
+        if previous.get(h) != [label, score, count]:
+            agg["n"] += count
+            agg["positives"] += count if label == "POSITIVE" else 0
+            agg["signed_sum"] += count * _signed(label, score)
+    inc("sentiment_aggregates_total", result="updated" if previous else "built")
+
+    if keywords is None:
+        keywords = extract_keywords([r["text"] for r in results])
+    agg["reviews"] = current
+    agg["summary"] = _format_summary(agg["n"], agg["positives"], agg["signed_sum"], keywords)
+    place_aggregates.set(place_id, agg)
+    return agg["summary"]
+
+
 # ----------- Summarize with Gemini -----------
-def summarize_with_gemini(place_name: str, sentiment_data: dict, reviews: list):
+def summarize_with_gemini(place_name: str, sentiment_data: dict, reviews: list, use_cache: bool = True):
     """
     Use Gemini to convert numeric sentiment data + example reviews into a human summary.
     """
     try:
-        model = genai.GenerativeModel(MODEL_NAME)
         reviews_text = "\n".join([r["text"] for r in reviews[:5]]) or "No reviews found."
         prompt = f"""
 You are an AI travel assistant. Based on the following Google reviews for {place_name},
@@ -120,22 +413,22 @@ Example response format:
 
 Now write your summary:
 """
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        return generate_text(prompt, MODEL_NAME, use_cache=use_cache).strip()
     except Exception:
-        return "Visitors generally had mixed experiences."
+        record_fallback("gemini", "degraded")
+        return fallback_summary(sentiment_data)
 
 
+def fallback_summary(sentiment_data: dict):
+    """Plain summary from the computed statistics, used when Gemini is unavailable."""
+    if not sentiment_data.get("keywords"):
+        return sentiment_data["summary"]
+    return f"{sentiment_data['summary']} Reviewers often mention {', '.join(sentiment_data['keywords'][:3])}."
 
-# ----------- Main Entry Point -----------
-def get_sentiment_insights(place_id: str, place_name: str = None):
-    reviews = get_place_reviews(place_id)
-    analyzed = analyze_reviews(reviews)
-    summary = summarize_sentiment(analyzed)
 
-    # Gemini-powered human summary
-    gemini_summary = summarize_with_gemini(place_name or "this place", summary, analyzed)
 
+# ----------- Main Entry Point -----------
+def _insights_payload(place_id, reviews, analyzed, summary, gemini_summary):
     return {
         "place_id": place_id,
         "num_reviews": len(reviews),
@@ -143,7 +436,87 @@ def get_sentiment_insights(place_id: str, place_name: str = None):
         "avg_score": summary["avg_score"],
         "positive_ratio": summary["positive_ratio"],
         "keywords": summary["keywords"],
-        "human_summary": gemini_summary, 
+        "human_summary": gemini_summary,
         "samples": analyzed[:3] # first 3 reviews
     }
 
+
+def get_sentiment_insights(place_id: str, place_name: str = None, reviews: list = None,
+                           use_cache: bool = True):
+    """
+    Sentiment summary for a place; pass `reviews` when they were already fetched.
+    use_cache=False skips the Gemini response cache.
+    """
+    if reviews is None:
+        reviews = get_place_reviews(place_id)
+    analyzed = analyze_reviews(reviews)
+    summary = summarize_place(place_id, analyzed)
+
+    # Gemini-powered human summary
+    gemini_summary = summarize_with_gemini(place_name or "this place", summary, analyzed, use_cache=use_cache)
+
+    return _insights_payload(place_id, reviews, analyzed, summary, gemini_summary)
+
+
+def _batch_workers(place_ids: list):
+    return max(1, min(SENTIMENT_BATCH_CONCURRENCY, len(place_ids)))
+
+
+def score_sentiment_batch(place_ids: list):
+    """
+    Reviews for many places, fetched concurrently and scored in one batched model pass.
+    Returns {place_id: (reviews, analyzed, keywords)}, or the exception for a place whose
+    reviews could not be fetched. A failed model pass raises (it affects every place).
+    """
+    def fetch(pid):
+        try:
+            return get_place_reviews(pid)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=_batch_workers(place_ids)) as pool:
+        fetched = list(pool.map(lambda pid: contextvars.copy_context().run(fetch, pid), place_ids))
+
+    ok = [i for i, reviews in enumerate(fetched) if not isinstance(reviews, Exception)]
+    analyzed_lists = analyze_reviews_many([fetched[i] for i in ok])
+    keyword_lists = extract_keywords_many([[r["text"] for r in analyzed] for analyzed in analyzed_lists])
+
+    scored = {pid: reviews for pid, reviews in zip(place_ids, fetched)}
+    for i, analyzed, keywords in zip(ok, analyzed_lists, keyword_lists):
+        scored[place_ids[i]] = (fetched[i], analyzed, keywords)
+    return scored
+
+
+def iter_sentiment_insights_batch(place_ids: list, place_names: dict = None, use_cache: bool = True,
+                                  scored: dict = None):
+    """
+    Sentiment insights for many places, yielded as each one finishes.
+    Reviews are fetched concurrently and scored in one batched model pass (pass `scored`
+    from score_sentiment_batch when that already ran), then the Gemini summaries run
+    concurrently (bounded by SENTIMENT_BATCH_CONCURRENCY).
+    """
+    place_names = place_names or {}
+    if scored is None:
+        scored = score_sentiment_batch(place_ids)
+
+    # --- Aggregate + Gemini summary per place, streamed as completed ---
+    def finish(pid):
+        if isinstance(scored[pid], Exception):
+            raise scored[pid]
+        reviews, analyzed, keywords = scored[pid]
+        summary = summarize_place(pid, analyzed, keywords=keywords)
+        # Each place gets its own deadline: this runs while the response streams, after the
+        # request's deadline (meant for fetching and scoring) may already be used up
+        with deadline_scope():
+            gemini_summary = summarize_with_gemini(
+                place_names.get(pid) or "this place", summary, analyzed, use_cache=use_cache
+            )
+        return _insights_payload(pid, reviews, analyzed, summary, gemini_summary)
+
+    with ThreadPoolExecutor(max_workers=_batch_workers(place_ids)) as pool:
+        futures = {pool.submit(contextvars.copy_context().run, finish, pid): pid for pid in place_ids}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                yield {"place_id": futures[future], "error": str(e)}
@@ -0,0 +1,92 @@
+# services/singleflight.py
+import asyncio, threading
+
+# name -> flight, so stats can be reported in one place
+_registry = {}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key (thread-based).
+    The first caller runs the function; callers that arrive while it is running
+    wait and receive the same result or exception. Nothing is kept afterwards,
+    so errors are never cached.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.shared = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    def do(self, key: str, fn, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+    def stats(self):
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._inflight)}
+
+
+class AsyncSingleFlight:
+    """
+    asyncio version of SingleFlight. The shared work runs in its own task, so a
+    waiter that disconnects (and is cancelled) does not cancel it for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.shared = 0
+        self._inflight = {}
+        _registry[name] = self
+
+    async def do(self, key: str, coro_fn, *args, **kwargs):
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_fn(*args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._inflight)}
+
+
+def get_flight_stats():
+    """Call/shared counters for every single-flight group."""
+    return {name: flight.stats() for name, flight in _registry.items()}